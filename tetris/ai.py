@@ -0,0 +1,173 @@
+from move_generator import *
+from concurrent.futures import ProcessPoolExecutor
+
+# Weights for (aggregate height, lines cleared, holes, bumpiness)
+DEFAULT_WEIGHTS: Final = (-0.510066, 0.760666, -0.35663, -0.184483)
+
+# Score of a board that can't take the next tetromino
+GAME_OVER_SCORE: Final = float("-inf")
+
+# Transposition table entries kept by each player, and by each worker process
+SEARCH_CACHE_SIZE: Final = 1 << 16
+
+# Board evaluations share the table with search results, keyed by the board's hash mixed with this
+EVALUATION_KEY: Final = randomKeys(1)[0]
+
+def evaluate(board, linesCleared, weights = DEFAULT_WEIGHTS):
+    heightWeight, linesWeight, holesWeight, bumpinessWeight = weights
+    heights = board.heights
+    aggregateHeight = sum(heights)
+
+    # Every empty block under the top of its column is a hole
+    holes = aggregateHeight - sum(row.bit_count() for row in board.rows)
+
+    bumpiness = 0
+    for col in range(0, BOARD_WIDTH - 1):
+        bumpiness += abs(heights[col] - heights[col + 1])
+
+    return heightWeight * aggregateHeight + linesWeight * linesCleared + holesWeight * holes + bumpinessWeight * bumpiness
+
+# Zobrist hash the board would have with the placement locked in, or None if it clears lines
+def placedHash(board, placement):
+    boardHash = board.hash
+    placedRows = {}
+    for row, col in placement.getCoords():
+        boardHash ^= CELL_KEYS[row * BOARD_WIDTH + col]
+        placedRows[row] = placedRows.get(row, 0) | (1 << col)
+    for row, rowBits in placedRows.items():
+        if (board.rows[row] | rowBits == FULL_ROW):
+            return None
+    return boardHash
+
+# Whether searching the shapes can reach a board in two ways, which is what the transposition table is for
+# Without hold, the shapes always come in the same order, so that takes a shape coming up twice (dropped in
+# either order). Line clears could too, but rarely enough that looking up every board doesn't pay for itself
+def hasTranspositions(shapes):
+    return len(set(shapes)) < len(shapes)
+
+# Copy of the board with the placement locked in, and the lines it cleared
+def applyPlacement(board, placement):
+    board = board.copy()
+    coords = placement.getCoords()
+    board.place(coords, placement.shapeId + 1)
+    return board, board.clearFullRows(set(row for row, col in coords))
+
+# Best score reachable by dropping each of the shapes in turn
+# The score is linear in the lines cleared, so the part reached from this board is cached by its Zobrist hash
+# and the shapes still to drop, regardless of the lines it took to get here. Evaluations of the boards after the
+# last drop are cached by hash alone, looked up before the board is built
+def searchScore(board, shapes, linesCleared, weights = DEFAULT_WEIGHTS, table = None):
+    return weights[1] * linesCleared + _futureScore(board, shapes, weights, table)
+
+def _futureScore(board, shapes, weights, table):
+    if (len(shapes) == 0):
+        return evaluate(board, 0, weights)
+
+    key = board.hash ^ queueHash(shapes)
+    if (table is not None):
+        cached = table.get(key)
+        if (cached is not None):
+            return cached
+
+    best = GAME_OVER_SCORE
+    for placement in generateDropPlacements(board, shapes[0]):
+        if (len(shapes) == 1 and table is not None):
+            childHash = placedHash(board, placement)
+            if (childHash is not None):
+                score = table.get(childHash ^ EVALUATION_KEY)
+                if (score is None):
+                    child, lines = applyPlacement(board, placement)
+                    score = evaluate(child, 0, weights)
+                    table.put(childHash ^ EVALUATION_KEY, score)
+                best = max(best, score)
+                continue
+        child, lines = applyPlacement(board, placement)
+        best = max(best, searchScore(child, shapes[1:], lines, weights, table))
+
+    if (table is not None):
+        table.put(key, best)
+    return best
+
+# Each worker process keeps its own table between tasks
+_workerTable = None
+
+# Runs in the worker processes, so it takes a single picklable argument
+def _searchScoreTask(task):
+    global _workerTable
+    if (_workerTable is None):
+        _workerTable = TranspositionTable(SEARCH_CACHE_SIZE)
+    board, shapes, linesCleared, weights, transposing = task
+    return searchScore(board, shapes, linesCleared, weights, _workerTable if transposing else None)
+
+class AIPlayer(object):
+    # Plays a GameManager through its public moves, picking the placement with the best weighted board evaluation
+    # It looks ahead over the next tetrominos in the bag. With more than 1 worker, each candidate's lookahead runs
+    # in a process pool. Chosen moves are cached in a transposition table, and so are searched boards when the
+    # lookahead can reach one twice
+    def __init__(self, gm, weights = DEFAULT_WEIGHTS, lookahead = 1, workers = 1, cacheSize = SEARCH_CACHE_SIZE):
+        self.gm = gm
+        self.weights = weights
+        self.lookahead = lookahead
+        self.workers = workers
+        self.table = TranspositionTable(cacheSize)
+        self.__executor = None
+        if (workers > 1 and lookahead > 0):
+            self.__executor = ProcessPoolExecutor(workers)
+
+    def close(self):
+        if (self.__executor is not None):
+            self.__executor.shutdown()
+            self.__executor = None
+
+    # The best placement for the current tetromino, or None if there are none
+    def chooseMove(self):
+        shapes = [bag.value for bag in self.gm.getPreview(self.lookahead)]
+
+        # The same board, tetromino and preview always gets the same move
+        moveKey = self.gm.getHash() ^ queueHash(shapes)
+        cached = self.table.get(moveKey)
+        if (cached is not None):
+            return cached
+
+        placements = generateCurrentPlacements(self.gm)
+        if (len(placements) == 0):
+            return None
+
+        # The table is only worth looking boards up in when the search can reach them twice
+        transposing = hasTranspositions([self.gm.currentMino.shapeId] + shapes)
+        tasks = []
+        for placement in placements:
+            child, lines = applyPlacement(self.gm.board, placement)
+            tasks.append((child, shapes, lines, self.weights, transposing))
+
+        if (self.__executor is not None):
+            chunkSize = max(1, len(tasks) // (self.workers * 4))
+            scores = list(self.__executor.map(_searchScoreTask, tasks, chunksize = chunkSize))
+        else:
+            table = self.table if transposing else None
+            scores = [searchScore(*task[:4], table) for task in tasks]
+
+        best = placements[max(range(0, len(placements)), key = lambda i: scores[i])]
+        self.table.put(moveKey, best)
+        return best
+
+    # Choose and play a placement. Returns it, or None if the game is over
+    def playPiece(self):
+        if (self.gm.gameOver):
+            return None
+
+        placement = self.chooseMove()
+        if (placement is None):
+            return None
+        for action in placement.path:
+            self.gm.perform(action)
+        return placement
+
+    # Play until the game is over or the given number of tetrominos are placed. Returns how many were placed
+    def playGame(self, maxPieces = None):
+        pieces = 0
+        while (maxPieces is None or pieces < maxPieces):
+            if (self.playPiece() is None):
+                break
+            pieces += 1
+        return pieces
@@ -0,0 +1,107 @@
+from game_manager import *
+import mmap
+import os
+
+# An archive is a header followed by snapshots back to back: magic, snapshot size, snapshot count
+ARCHIVE_MAGIC: Final = b"TSNP"
+ARCHIVE_HEADER: Final = struct.Struct("<4sIQ")
+
+# Snapshots the writer makes room for at a time, at first. The room doubles as it fills up
+ARCHIVE_GROWTH: Final = 4096
+
+class SnapshotArchiveWriter(object):
+    # Appends snapshots to a memory-mapped archive file, growing the file ahead of them
+    # The header's count is only written on close, and the file trimmed to the snapshots written
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.__file = open(path, "w+b")
+        self.__map = None
+        self.__capacity = 0
+        self.__grow(ARCHIVE_GROWTH)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __grow(self, capacity):
+        if (self.__map is not None):
+            self.__map.close()
+        self.__file.truncate(ARCHIVE_HEADER.size + capacity * SNAPSHOT_SIZE)
+        self.__map = mmap.mmap(self.__file.fileno(), 0)
+        self.__capacity = capacity
+
+    # Snapshot bytes, or a GameManager to snapshot
+    def append(self, snapshot):
+        if (isinstance(snapshot, GameManager)):
+            snapshot = snapshot.snapshot()
+        if (self.count == self.__capacity):
+            self.__grow(self.__capacity * 2)
+        offset = ARCHIVE_HEADER.size + self.count * SNAPSHOT_SIZE
+        self.__map[offset:offset + SNAPSHOT_SIZE] = snapshot
+        self.count += 1
+
+    def close(self):
+        if (self.__file is None):
+            return
+        ARCHIVE_HEADER.pack_into(self.__map, 0, ARCHIVE_MAGIC, SNAPSHOT_SIZE, self.count)
+        self.__map.close()
+        self.__file.truncate(ARCHIVE_HEADER.size + self.count * SNAPSHOT_SIZE)
+        self.__file.close()
+        self.__file = None
+
+class SnapshotArchive(object):
+    # Reads an archive through a read-only memory map. Snapshots are memoryviews into the map, so nothing is copied
+    # until GameManager.restore reads one
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self.__map = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+        magic, snapshotSize, self.count = ARCHIVE_HEADER.unpack_from(self.__map, 0)
+        if (magic != ARCHIVE_MAGIC or snapshotSize != SNAPSHOT_SIZE):
+            self.__map.close()
+            raise ValueError("Not a snapshot archive for this board: " + str(path))
+        self.__view = memoryview(self.__map)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if (self.__view is None):
+            raise ValueError("Archive is closed")
+        if (index < 0):
+            index += self.count
+        if (index < 0 or index >= self.count):
+            raise IndexError(index)
+        offset = ARCHIVE_HEADER.size + index * SNAPSHOT_SIZE
+        return self.__view[offset:offset + SNAPSHOT_SIZE]
+
+    def __iter__(self):
+        for index in range(0, self.count):
+            yield self[index]
+
+    # Every snapshot back to back, e.g. for numpy.frombuffer
+    def getBuffer(self):
+        if (self.__view is None):
+            raise ValueError("Archive is closed")
+        return self.__view[ARCHIVE_HEADER.size:ARCHIVE_HEADER.size + self.count * SNAPSHOT_SIZE]
+
+    def close(self):
+        if (self.__view is None):
+            return
+        self.__view.release()
+        self.__view = None
+        try:
+            self.__map.close()
+        except BufferError:
+            # Snapshots handed out are still alive (e.g. the last one a loop went through). The map is kept
+            # and gets unmapped once the last of them is gone
+            pass
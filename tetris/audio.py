@@ -0,0 +1,156 @@
+from typing import Final
+from events import *
+from enum import Enum
+import math
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import wave
+
+# winsound only exists on Windows. Elsewhere sounds are played from WAV files, if a player is installed
+try:
+    import winsound
+except ImportError:
+    winsound = None
+
+class Sound(Enum):
+    MOVE = 0
+    HARD_DROP = 1
+    ROTATE = 2
+    LINE_CLEARED_ANY = 3
+    LINE_CLEARED_TETRIS = 4
+
+# Sounds waiting to be played. Anything past this while the worker is busy is dropped
+AUDIO_QUEUE_SIZE: Final = 16
+
+class NullBackend(object):
+    def play(self, sound):
+        pass
+
+class WinsoundBackend(object):
+    def play(self, sound):
+        if (sound == Sound.MOVE):
+            winsound.Beep(100, 10)
+        elif (sound == Sound.HARD_DROP):
+            winsound.Beep(80, 50)
+        elif (sound == Sound.ROTATE):
+            winsound.PlaySound(r"C:\Windows\Media\Windows Navigation Start.wav", winsound.SND_ASYNC)
+        elif (sound == Sound.LINE_CLEARED_ANY):
+            winsound.PlaySound(r"C:\Windows\Media\Windows Default.wav", winsound.SND_ASYNC)
+        elif (sound == Sound.LINE_CLEARED_TETRIS):
+            winsound.PlaySound(r"C:\Windows\Media\Speech On.wav", winsound.SND_ASYNC)
+
+class WavBackend(object):
+    # Writes a short tone per sound to a WAV file once, then hands the file to a command line player
+    TONES = {
+        Sound.MOVE: (100, 10),
+        Sound.HARD_DROP: (80, 50),
+        Sound.ROTATE: (440, 40),
+        Sound.LINE_CLEARED_ANY: (660, 120),
+        Sound.LINE_CLEARED_TETRIS: (880, 250)
+    }
+    SAMPLE_RATE = 22050
+
+    def __init__(self, player):
+        self.player = player
+        self.directory = tempfile.mkdtemp(prefix = "tetris-audio-")
+        self.files = {}
+        for sound, (frequency, duration) in self.TONES.items():
+            self.files[sound] = self.__writeTone(sound.name.lower() + ".wav", frequency, duration)
+
+    def __writeTone(self, name, frequency, duration):
+        path = os.path.join(self.directory, name)
+        samples = int(self.SAMPLE_RATE * duration / 1000)
+        frames = b"".join(
+            struct.pack("<h", int(12000 * math.sin(2 * math.pi * frequency * i / self.SAMPLE_RATE))) for i in range(samples)
+        )
+        with wave.open(path, "wb") as file:
+            file.setnchannels(1)
+            file.setsampwidth(2)
+            file.setframerate(self.SAMPLE_RATE)
+            file.writeframes(frames)
+        return path
+
+    def play(self, sound):
+        # The player runs in its own process, so playing never waits for the sound to finish
+        subprocess.Popen([self.player, self.files[sound]], stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+
+# The best backend this platform has
+def createBackend():
+    if (winsound is not None):
+        return WinsoundBackend()
+    for player in ("aplay", "afplay", "paplay"):
+        path = shutil.which(player)
+        if (path is not None):
+            return WavBackend(path)
+    return NullBackend()
+
+class AudioService(object):
+    # Plays sounds on a worker thread so the game never waits on audio
+    # A sound that is already waiting isn't queued again, so bursts (e.g. from key repeat) play once
+    def __init__(self, backend):
+        self.backend = backend
+        self.__queue = queue.Queue(AUDIO_QUEUE_SIZE)
+        self.__waiting = set()
+        self.__lock = threading.Lock()
+        self.__worker = threading.Thread(target = self.__run, name = "AudioService", daemon = True)
+        self.__worker.start()
+
+    def play(self, sound):
+        with self.__lock:
+            if (sound in self.__waiting):
+                return
+            try:
+                self.__queue.put_nowait(sound)
+                self.__waiting.add(sound)
+            except queue.Full:
+                pass
+
+    def close(self):
+        # None tells the worker to stop. Blocks until there's room for it
+        self.__queue.put(None)
+        self.__worker.join()
+
+    def __run(self):
+        while True:
+            sound = self.__queue.get()
+            if (sound is None):
+                return
+
+            with self.__lock:
+                self.__waiting.discard(sound)
+            self.backend.play(sound)
+
+class SoundListener(GameListener):
+    def __init__(self, service):
+        self.service = service
+
+    def onMove(self):
+        self.service.play(Sound.MOVE)
+
+    def onRotate(self):
+        self.service.play(Sound.ROTATE)
+
+    def onPlaced(self, linesCleared):
+        # Play a sound based on number of lines cleared
+        if (linesCleared <= 0):
+            self.service.play(Sound.HARD_DROP)
+        if (linesCleared > 0 and linesCleared < 4):
+            self.service.play(Sound.LINE_CLEARED_ANY)
+        elif (linesCleared >= 4):
+            self.service.play(Sound.LINE_CLEARED_TETRIS)
+
+# Attach sound to a GameManager, if the platform can play it. Returns the AudioService, or None
+def attachSound(gm, backend = None):
+    if (backend is None):
+        backend = createBackend()
+    if (isinstance(backend, NullBackend)):
+        return None
+
+    service = AudioService(backend)
+    gm.addListener(SoundListener(service))
+    return service
@@ -0,0 +1,219 @@
+import numpy as np
+from game_manager import *
+
+# Rotation directions, in the order of the kick tables' turn index
+TURNS: Final = (1, -1, 2)
+
+# The most kick tests any rotation has (180 degree rotations have 6)
+MAX_KICK_TESTS: Final = 6
+
+# Relative (row, col) of every block, indexed [shapeId, state, block]
+def _buildStateTables():
+    cellRows = np.array([[[relRow for relRow, relCol in cells] for cells in states] for states in STATE_CELLS], dtype = np.int16)
+    cellCols = np.array([[[relCol for relRow, relCol in cells] for cells in states] for states in STATE_CELLS], dtype = np.int16)
+    return cellRows, cellCols
+
+# (row, col) offset of every kick test, indexed [shapeId, currentState, turn, test]
+# Rotations with fewer tests repeat their last one, which fails again
+def _buildKickTables():
+    kickRows = np.zeros((len(STATE_CELLS), 4, len(TURNS), MAX_KICK_TESTS), dtype = np.int16)
+    kickCols = np.zeros((len(STATE_CELLS), 4, len(TURNS), MAX_KICK_TESTS), dtype = np.int16)
+    for shapeId in range(0, len(STATE_CELLS)):
+        for state in range(0, 4):
+            for turn, direction in enumerate(TURNS):
+                kicks = ROTATIONS[shapeId][state][rotatedState(state, direction)]
+                for test in range(0, MAX_KICK_TESTS):
+                    rowOffset, colOffset, cells = kicks[min(test, len(kicks) - 1)]
+                    kickRows[shapeId, state, turn, test] = rowOffset
+                    kickCols[shapeId, state, turn, test] = colOffset
+    return kickRows, kickCols
+
+CELL_ROWS, CELL_COLS = _buildStateTables()
+KICK_ROWS, KICK_COLS = _buildKickTables()
+
+# Shape of every block of every bag order, indexed [order, position]
+BAG_ORDER_SHAPES: Final = np.array([[bag.value for bag in order] for order in BAG_ORDERS], dtype = np.int16)
+
+# splitMix over arrays of seeds and bag indices. uint64 arithmetic wraps like the masking does
+def _splitMix(seeds, indices):
+    z = seeds.astype(np.uint64) + (indices.astype(np.uint64) + np.uint64(1)) * np.uint64(SPLITMIX_GAMMA)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(SPLITMIX_MUL1)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(SPLITMIX_MUL2)
+    return z ^ (z >> np.uint64(31))
+
+# Steps many games at once. Each game is a row of the arrays below, and every action is applied to all of the games
+# that requested it with vectorized operations instead of looping over GameManager instances
+class BatchSimulator(object):
+    def __init__(self, count, seed = None):
+        self.count = count
+        self.rng = np.random.default_rng(seed)
+
+        # One bitmask per row of each board, bit n being column n. Only placed blocks are stored
+        self.boards = np.zeros((count, BOARD_HEIGHT), dtype = np.uint16)
+
+        # Current tetromino of each game
+        self.shapes = np.zeros(count, dtype = np.int16)
+        self.states = np.zeros(count, dtype = np.int16)
+        self.rows = np.zeros(count, dtype = np.int16)
+        self.cols = np.zeros(count, dtype = np.int16)
+
+        # Current and next bag of each game, and the position in the current bag
+        self.bags = np.zeros((count, 14), dtype = np.int16)
+        self.bagPositions = np.zeros(count, dtype = np.int16)
+
+        # Seed of each game, and the index of the next bag it takes. Bags are made like PieceGenerator's,
+        # so a game plays the same tetrominos as a GameManager with the same seed
+        self.seeds = np.zeros(count, dtype = np.int64)
+        self.bagIndices = np.zeros(count, dtype = np.int64)
+
+        self.linesCleared = np.zeros(count, dtype = np.int64)
+        self.piecesPlaced = np.zeros(count, dtype = np.int64)
+        self.gameOver = np.zeros(count, dtype = bool)
+
+        self.reset()
+
+    # Restart the given games, or all of them, with the given seeds or ones drawn from the simulator's RNG
+    def reset(self, index = None, seeds = None):
+        if (index is None):
+            index = np.arange(self.count)
+        index = np.asarray(index)
+        if (seeds is None):
+            seeds = self.rng.integers(0, 1 << 63, size = len(index), dtype = np.int64)
+
+        self.boards[index] = 0
+        self.seeds[index] = seeds
+        self.bagIndices[index] = 0
+        self.bags[index, :7] = self.__createBags(index)
+        self.bags[index, 7:] = self.__createBags(index)
+        self.bagPositions[index] = 0
+        self.linesCleared[index] = 0
+        self.piecesPlaced[index] = 0
+        self.gameOver[index] = False
+        self.__nextTetromino(index)
+
+    # Apply one action per game. Games that are over ignore their action
+    # Returns the lines cleared by each game during this step
+    def step(self, actions):
+        actions = np.asarray(actions)
+        linesCleared = np.zeros(self.count, dtype = np.int64)
+        playing = ~self.gameOver
+
+        def gamesDoing(action):
+            return np.nonzero(playing & (actions == action.value))[0]
+
+        self.__move(gamesDoing(Action.LEFT), 0, -1)
+        self.__move(gamesDoing(Action.RIGHT), 0, 1)
+        self.__move(gamesDoing(Action.SOFT_DROP), 1, 0)
+        self.__rotate(gamesDoing(Action.CW), 0)
+        self.__rotate(gamesDoing(Action.CCW), 1)
+        self.__rotate(gamesDoing(Action.REVERSE), 2)
+
+        index = gamesDoing(Action.HARD_DROP)
+        if (index.size > 0):
+            self.__hardDrop(index)
+            self.__place(index)
+            linesCleared[index] = self.__clearFullRows(index)
+            self.__nextTetromino(index)
+
+        return linesCleared
+
+    # Absolute (row, col) of every block of the given games' tetrominos, each shaped (games, 4)
+    def __cells(self, index, states, rows, cols):
+        shapes = self.shapes[index]
+        return rows[:, None] + CELL_ROWS[shapes, states], cols[:, None] + CELL_COLS[shapes, states]
+
+    # True for each game whose tetromino fits at the given state and position
+    def __fits(self, index, states, rows, cols):
+        cellRows, cellCols = self.__cells(index, states, rows, cols)
+        inside = (cellRows >= 0) & (cellRows < BOARD_HEIGHT) & (cellCols >= 0) & (cellCols < BOARD_WIDTH)
+
+        # Clip so outside blocks can still be looked up. They already failed the test
+        cellRows = np.clip(cellRows, 0, BOARD_HEIGHT - 1)
+        cellCols = np.clip(cellCols, 0, BOARD_WIDTH - 1)
+        occupied = (self.boards[index[:, None], cellRows] >> cellCols.astype(np.uint16)) & 1
+        return np.all(inside & (occupied == 0), axis = 1)
+
+    def __move(self, index, rowOffset, colOffset):
+        if (index.size == 0):
+            return
+        rows = self.rows[index] + rowOffset
+        cols = self.cols[index] + colOffset
+        moved = self.__fits(index, self.states[index], rows, cols)
+        self.rows[index[moved]] = rows[moved]
+        self.cols[index[moved]] = cols[moved]
+
+    def __rotate(self, index, turn):
+        if (index.size == 0):
+            return
+        shapes = self.shapes[index]
+        currentStates = self.states[index]
+        desiredStates = (currentStates + TURNS[turn]) % 4
+
+        # Try each kick test on the games that haven't passed one yet
+        pending = np.arange(index.size)
+        for test in range(0, MAX_KICK_TESTS):
+            rows = self.rows[index[pending]] + KICK_ROWS[shapes[pending], currentStates[pending], turn, test]
+            cols = self.cols[index[pending]] + KICK_COLS[shapes[pending], currentStates[pending], turn, test]
+            passed = self.__fits(index[pending], desiredStates[pending], rows, cols)
+
+            games = index[pending[passed]]
+            self.states[games] = desiredStates[pending[passed]]
+            self.rows[games] = rows[passed]
+            self.cols[games] = cols[passed]
+
+            pending = pending[~passed]
+            if (pending.size == 0):
+                break
+
+    def __hardDrop(self, index):
+        # Drop a row at a time until none of the games' tetrominos can fall any further
+        falling = index
+        while (falling.size > 0):
+            falling = falling[self.__fits(falling, self.states[falling], self.rows[falling] + 1, self.cols[falling])]
+            self.rows[falling] += 1
+
+    def __place(self, index):
+        cellRows, cellCols = self.__cells(index, self.states[index], self.rows[index], self.cols[index])
+        games = np.broadcast_to(index[:, None], cellRows.shape)
+        np.bitwise_or.at(self.boards, (games, cellRows), (1 << cellCols).astype(np.uint16))
+        self.piecesPlaced[index] += 1
+
+    def __clearFullRows(self, index):
+        boards = self.boards[index]
+        full = boards == FULL_ROW
+        linesCleared = full.sum(axis = 1)
+
+        # Empty the full rows, then sort them to the top. The sort is stable, so the other rows keep their order
+        clearing = linesCleared > 0
+        if (np.any(clearing)):
+            boards = boards[clearing]
+            full = full[clearing]
+            boards[full] = 0
+            order = np.argsort(~full, axis = 1, kind = "stable")
+            self.boards[index[clearing]] = np.take_along_axis(boards, order, axis = 1)
+
+        self.linesCleared[index] += linesCleared
+        return linesCleared
+
+    def __createBags(self, index):
+        orders = _splitMix(self.seeds[index], self.bagIndices[index]) % np.uint64(len(BAG_ORDERS))
+        self.bagIndices[index] += 1
+        return BAG_ORDER_SHAPES[orders.astype(np.intp)]
+
+    def __nextTetromino(self, index):
+        self.shapes[index] = self.bags[index, self.bagPositions[index]]
+        self.bagPositions[index] += 1
+
+        # Move on to the next bag once the current one is empty
+        emptied = index[self.bagPositions[index] == 7]
+        if (emptied.size > 0):
+            self.bags[emptied, :7] = self.bags[emptied, 7:]
+            self.bags[emptied, 7:] = self.__createBags(emptied)
+            self.bagPositions[emptied] = 0
+
+        self.states[index] = 0
+        self.rows[index] = STARTING_COORD_ROW
+        self.cols[index] = STARTING_COORD_COL
+
+        # The game is over once a tetromino spawns on top of placed blocks
+        self.gameOver[index] |= ~self.__fits(index, self.states[index], self.rows[index], self.cols[index])
@@ -0,0 +1,221 @@
+from game_manager import *
+from move_generator import *
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+# Timed runs of each operation, and tetrominos placed by the random game benchmark
+BENCHMARK_ITERATIONS: Final = 20000
+GAME_PIECES: Final = 5000
+
+# Seed of the board fixtures and of the random game's inputs, so every run measures the same work
+FIXTURE_SEED: Final = 1234
+
+# Inputs of the random game benchmark
+GAME_ACTIONS: Final = (Action.LEFT, Action.RIGHT, Action.CW, Action.CCW, Action.REVERSE, Action.SOFT_DROP, Action.HARD_DROP)
+
+def _fixture(seed, heights, holes = False):
+    # A stack with the given column heights, and optionally a hole in every row
+    rng = random.Random(seed)
+    gm = GameManager(seed)
+    for col in range(0, BOARD_WIDTH):
+        for height in range(0, heights[col]):
+            gm.createTestBlock(BOARD_HEIGHT - 1 - height, col)
+    if (holes):
+        for row in range(BOARD_HEIGHT - max(heights), BOARD_HEIGHT):
+            gm.destroyTestBlock(row, rng.randrange(0, BOARD_WIDTH))
+    return gm.snapshot()
+
+# Snapshots of the boards the operations run on, by name
+def buildFixtures(seed = FIXTURE_SEED):
+    rng = random.Random(seed)
+    return {
+        "empty": _fixture(seed, [0] * BOARD_WIDTH),
+        "garbage": _fixture(seed, [8] * BOARD_WIDTH, True),
+        "jagged": _fixture(seed, [rng.randrange(0, 12) for col in range(0, BOARD_WIDTH)]),
+        "tall": _fixture(seed, [rng.randrange(12, 18) for col in range(0, BOARD_WIDTH)])
+    }
+
+# A fixture with the current tetromino moved to a reachable spot where rotating in the direction needs a kick
+def _kickFixture(snapshot, direction):
+    gm = GameManager()
+    gm.restore(snapshot)
+    for shapeId in (Bag.T.value, Bag.J.value, Bag.L.value, Bag.S.value, Bag.Z.value, Bag.I.value):
+        for placement in generatePlacements(gm.board, shapeId):
+            state = placement.state
+            row, col = placement.absCoords
+            tests = ROTATIONS[shapeId][state][rotatedState(state, direction)]
+            passing = [test for test, (rowOffset, colOffset, cells) in enumerate(tests) if gm.board.fitsAt(cells, row, col)]
+            if (len(passing) > 0 and passing[0] > 0):
+                gm.currentMino.spawn(TETROMINO_TYPES[shapeId], placement.absCoords)
+                gm.currentMino.currentState = state
+                return gm.snapshot()
+    return None
+
+# A fixture with full rows at the bottom, and a vertical I in the well that completes the given number of them
+def _clearFixture(seed, lines):
+    rng = random.Random(seed)
+    gm = GameManager(seed)
+    for row in range(BOARD_HEIGHT - 8, BOARD_HEIGHT):
+        # Rows above the ones being cleared get a hole, so they move down without clearing
+        hole = BOARD_WIDTH - 1 if row >= BOARD_HEIGHT - lines else rng.randrange(0, BOARD_WIDTH - 1)
+        for col in range(0, BOARD_WIDTH - 1):
+            if (col != hole):
+                gm.createTestBlock(row, col)
+    coords = [(BOARD_HEIGHT - 1 - height, BOARD_WIDTH - 1) for height in range(0, 4)]
+    return gm.snapshot(), coords
+
+def _summarize(samples):
+    samples.sort()
+    mean = sum(samples) / len(samples)
+    return {
+        "iterations": len(samples),
+        "meanUs": mean / 1000,
+        "medianUs": samples[len(samples) // 2] / 1000,
+        "p99Us": samples[int(len(samples) * 0.99)] / 1000,
+        "opsPerSec": 1e9 / mean if mean > 0 else 0.0
+    }
+
+# Time an operation on a fresh copy of the snapshot each run. Only the operation itself is timed
+def timeOperation(snapshot, operation, iterations = BENCHMARK_ITERATIONS, prepare = None):
+    gm = GameManager()
+    samples = []
+    clock = time.perf_counter_ns
+    for i in range(0, iterations):
+        gm.restore(snapshot)
+        if (prepare is not None):
+            prepare(gm)
+        start = clock()
+        operation(gm)
+        samples.append(clock() - start)
+    return _summarize(samples)
+
+# Tetrominos placed per second by seeded random inputs, starting a new game whenever one ends
+def timeRandomGame(pieces = GAME_PIECES, seed = FIXTURE_SEED):
+    rng = random.Random(seed)
+    gm = GameManager(seed)
+    placed = 0
+    inputs = 0
+    start = time.perf_counter()
+    while (placed < pieces):
+        position = gm.pieces.position
+        gm.perform(rng.choice(GAME_ACTIONS))
+        inputs += 1
+        placed += gm.pieces.position - position
+        if (gm.gameOver):
+            gm = GameManager(rng.getrandbits(63))
+    elapsed = time.perf_counter() - start
+    return {"pieces": placed, "inputs": inputs, "seconds": elapsed, "piecesPerSec": placed / elapsed}
+
+# Frames per second of GameWindow redrawing after seeded random inputs. Needs a display (e.g. Xvfb)
+def timeRender(frames = 2000, seed = FIXTURE_SEED):
+    if (sys.platform != "win32" and sys.platform != "darwin" and not os.environ.get("DISPLAY")):
+        return {"skipped": "no display"}
+    try:
+        import tkinter
+        from run import GameWindow
+        window = GameWindow(sound = False)
+    except Exception as e:
+        return {"skipped": str(e)}
+
+    window.timer.stop()
+    window.frameLoop.stop()
+    rng = random.Random(seed)
+    updateWindow = window._GameWindow__updateWindow
+    samples = []
+    clock = time.perf_counter_ns
+    for i in range(0, frames):
+        window.gm.perform(rng.choice(GAME_ACTIONS))
+        if (window.gm.gameOver):
+            window.gm.restore(GameManager(rng.getrandbits(63)).snapshot())
+        start = clock()
+        updateWindow()
+        window.update_idletasks()
+        samples.append(clock() - start)
+    window.destroy()
+    return _summarize(samples)
+
+def runBenchmarks(iterations = BENCHMARK_ITERATIONS, seed = FIXTURE_SEED, render = True):
+    fixtures = buildFixtures(seed)
+    results = {}
+
+    for name, snapshot in fixtures.items():
+        results["moveLeft/" + name] = timeOperation(snapshot, GameManager.moveLeft, iterations)
+        results["moveRight/" + name] = timeOperation(snapshot, GameManager.moveRight, iterations)
+        results["softDrop/" + name] = timeOperation(snapshot, GameManager.softDrop, iterations)
+        results["hardDrop/" + name] = timeOperation(snapshot, GameManager.hardDrop, iterations)
+        results["spawn/" + name] = timeOperation(snapshot, lambda gm: gm._GameManager__nextTetromino(), iterations)
+
+    # Spawned tetrominos rotate without kicks on an empty board
+    results["cw/noKick"] = timeOperation(fixtures["empty"], GameManager.cw, iterations)
+    results["ccw/noKick"] = timeOperation(fixtures["empty"], GameManager.ccw, iterations)
+    for name, direction, method in (("cw", 1, GameManager.cw), ("ccw", -1, GameManager.ccw)):
+        snapshot = _kickFixture(fixtures["jagged"], direction)
+        if (snapshot is not None):
+            results[name + "/kick"] = timeOperation(snapshot, method, iterations)
+
+    for lines in range(1, 5):
+        snapshot, coords = _clearFixture(seed, lines)
+        def prepare(gm, coords = coords):
+            gm.board.place(coords, Bag.I.value + 1)
+            gm.currentCoords = coords
+        results["checkRowsCompleted/" + str(lines)] = timeOperation(
+            snapshot, lambda gm: gm._GameManager__checkRowsCompleted(), iterations, prepare
+        )
+
+    results["randomGame"] = timeRandomGame(seed = seed)
+    if (render):
+        results["render"] = timeRender(seed = seed)
+    return results
+
+# Median time of every benchmark, relative to a previous run's. Above 1 is slower
+def compareResults(results, baseline):
+    ratios = {}
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if (previous is not None and "medianUs" in result and previous.get("medianUs")):
+            ratios[name] = result["medianUs"] / previous["medianUs"]
+        elif (previous is not None and "piecesPerSec" in result and previous.get("piecesPerSec")):
+            ratios[name] = previous["piecesPerSec"] / result["piecesPerSec"]
+    return ratios
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Time the game's hot paths and write the results as JSON")
+    parser.add_argument("--output", default = "benchmark.json", help = "JSON file to write the results to")
+    parser.add_argument("--iterations", type = int, default = BENCHMARK_ITERATIONS, help = "Timed runs of each operation")
+    parser.add_argument("--seed", type = int, default = FIXTURE_SEED, help = "Seed of the fixtures and random inputs")
+    parser.add_argument("--no-render", action = "store_true", help = "Skip the GameWindow benchmark")
+    parser.add_argument("--compare", help = "Earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    results = runBenchmarks(args.iterations, args.seed, not args.no_render)
+    report = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "iterations": args.iterations,
+        "seed": args.seed,
+        "results": results
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent = 2)
+
+    ratios = {}
+    if (args.compare is not None):
+        with open(args.compare) as file:
+            ratios = compareResults(results, json.load(file)["results"])
+
+    for name, result in results.items():
+        if ("medianUs" in result):
+            line = "%-28s %10.2f us median %10.2f us p99" % (name, result["medianUs"], result["p99Us"])
+        elif ("piecesPerSec" in result):
+            line = "%-28s %10.0f pieces/sec" % (name, result["piecesPerSec"])
+        else:
+            line = "%-28s skipped: %s" % (name, result["skipped"])
+        if (name in ratios):
+            line += "   x%.2f" % ratios[name]
+        print(line)
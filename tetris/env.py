@@ -0,0 +1,123 @@
+import numpy as np
+from game_manager import *
+
+# Actions are Action values, hold excluded
+ACTION_COUNT: Final = PLAYABLE_ACTION_COUNT
+
+# The current tetromino in its observation: shapeId, state, row, col
+PIECE_FORMAT: Final = struct.Struct("<BBbb")
+
+class TetrisEnv(GameListener):
+    # Gym-style environment around a headless GameManager: reset(seed) and step(action) return observations,
+    # and step the reward (lines cleared) and whether the game is over
+    # An observation is a dict of arrays: "board" holds palette indices (0 being empty), "piece" the current
+    # tetromino, "preview" the upcoming shapeIds and "hold" the held shapeId (-1 if none)
+    # They're numpy views of buffers the game writes to, so they aren't copied on each step. The same arrays
+    # are returned every time and change as the game goes on, so copy them to keep them
+    # The buffers can be given by the caller, see VectorTetrisEnv
+    def __init__(self, previewLength = 5, cells = None, piece = None, preview = None, hold = None):
+        super(TetrisEnv, self).__init__()
+        self.previewLength = previewLength
+        self.__cells = cells if cells is not None else bytearray(BOARD_WIDTH * BOARD_HEIGHT)
+        self.__piece = piece if piece is not None else bytearray(PIECE_FORMAT.size)
+        self.__preview = preview if preview is not None else bytearray(previewLength)
+        self.__hold = hold if hold is not None else bytearray(1)
+
+        self.gm = GameManager(previewLength = previewLength)
+        self.gm.board = Board(self.__cells)
+        self.gm.addListener(self)
+
+        self.observation = {
+            "board": np.frombuffer(self.__cells, dtype = np.uint8).reshape(BOARD_HEIGHT, BOARD_WIDTH),
+            "piece": np.frombuffer(self.__piece, dtype = np.int8),
+            "preview": np.frombuffer(self.__preview, dtype = np.uint8),
+            "hold": np.frombuffer(self.__hold, dtype = np.int8)
+        }
+        self.linesCleared = 0
+        self.piecesPlaced = 0
+        self.__stepLines = 0
+
+    def onPlaced(self, linesCleared):
+        self.__stepLines += linesCleared
+        self.linesCleared += linesCleared
+        self.piecesPlaced += 1
+
+    # The preview only changes when a tetromino spawns
+    def onSpawn(self, mino):
+        self.__preview[0:self.previewLength] = bytes(bag.value for bag in self.gm.getPreview(self.previewLength))
+
+    # Start a new game. Without a seed, a random one is picked
+    def reset(self, seed = None):
+        # A fresh game is restored into this one, so the board keeps writing to the same buffer
+        self.gm.restore(GameManager(seed, self.previewLength).snapshot())
+        self.linesCleared = 0
+        self.piecesPlaced = 0
+        self.onSpawn(self.gm.currentMino)
+        self.__hold[0] = HELD_NONE # Hold isn't implemented yet
+        self.__writeObservation()
+        return self.observation
+
+    # Apply an Action (or its value). Returns (observation, reward, done, info)
+    def step(self, action):
+        self.__stepLines = 0
+        self.gm.perform(Action(action))
+        self.__writeObservation()
+        info = {"linesCleared": self.linesCleared, "piecesPlaced": self.piecesPlaced}
+        return self.observation, self.__stepLines, self.gm.gameOver, info
+
+    def __writeObservation(self):
+        mino = self.gm.currentMino
+        row, col = mino.absCoords
+        PIECE_FORMAT.pack_into(self.__piece, 0, mino.shapeId, mino.currentState, row, col)
+
+class VectorTetrisEnv(object):
+    # Many TetrisEnvs stepped with one call. Their observations are slices of shared buffers, so the batched
+    # observation arrays (first axis being the environment) are views too
+    # With autoReset, games that ended are reset at the start of the next step, and report a reward of 0 for it
+    def __init__(self, count, previewLength = 5, autoReset = True):
+        self.count = count
+        self.autoReset = autoReset
+        cells = bytearray(count * BOARD_WIDTH * BOARD_HEIGHT)
+        piece = bytearray(count * PIECE_FORMAT.size)
+        preview = bytearray(count * previewLength)
+        hold = bytearray(count)
+
+        self.envs = []
+        for index in range(0, count):
+            self.envs.append(TetrisEnv(
+                previewLength,
+                _slice(cells, index, BOARD_WIDTH * BOARD_HEIGHT),
+                _slice(piece, index, PIECE_FORMAT.size),
+                _slice(preview, index, previewLength),
+                _slice(hold, index, 1)
+            ))
+
+        self.observation = {
+            "board": np.frombuffer(cells, dtype = np.uint8).reshape(count, BOARD_HEIGHT, BOARD_WIDTH),
+            "piece": np.frombuffer(piece, dtype = np.int8).reshape(count, PIECE_FORMAT.size),
+            "preview": np.frombuffer(preview, dtype = np.uint8).reshape(count, previewLength),
+            "hold": np.frombuffer(hold, dtype = np.int8).reshape(count, 1)
+        }
+        self.dones = np.zeros(count, dtype = bool)
+
+    # Reset every game, with a seed each or random ones
+    def reset(self, seeds = None):
+        for index, env in enumerate(self.envs):
+            env.reset(None if seeds is None else int(seeds[index]))
+        self.dones[:] = False
+        return self.observation
+
+    # Apply one action per game. Returns (observation, rewards, dones)
+    def step(self, actions):
+        rewards = np.zeros(self.count, dtype = np.int64)
+        for index, env in enumerate(self.envs):
+            if (self.dones[index]):
+                if (self.autoReset):
+                    env.reset()
+                    self.dones[index] = False
+                continue
+            observation, rewards[index], self.dones[index], info = env.step(actions[index])
+        return self.observation, rewards, self.dones.copy()
+
+def _slice(buffer, index, size):
+    return memoryview(buffer)[index * size:(index + 1) * size]
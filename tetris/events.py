@@ -0,0 +1,31 @@
+class GameListener(object):
+    # Receives events from a GameManager
+    # Every event is a no-op by default, so listeners only override what they care about
+
+    # The current tetromino moved left or right
+    def onMove(self):
+        pass
+
+    # The current tetromino rotated (kicks included)
+    def onRotate(self):
+        pass
+
+    # The current tetromino was placed on the board, clearing 0 or more lines
+    def onPlaced(self, linesCleared):
+        pass
+
+    # Lines cleared by the last placement attacked with the given lines of garbage, after cancelling any waiting
+    def onAttack(self, lines):
+        pass
+
+    # A new tetromino spawned at the top of the board
+    def onSpawn(self, mino):
+        pass
+
+    # The board or the current tetromino changed. dirtyCells holds the (row, col) of every block that changed
+    def onUpdate(self, dirtyCells):
+        pass
+
+    # A new tetromino spawned on top of placed blocks
+    def onGameOver(self):
+        pass
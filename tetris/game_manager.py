@@ -1,103 +1,368 @@
 from typing import Final
+from enum import Enum
 from tetrominos import *
-import winsound
+from events import *
+from srs import *
+from zobrist import *
+from piece_generator import *
+from recorder import *
+from garbage import *
 import copy
-import random
+import struct
 
 # In pixels
 BLOCK_SIZE: Final = 25
 
-EMPTY_BLOCK: Final = Block()
-
 # In blocks
 BOARD_WIDTH: Final = 10
 BOARD_HEIGHT: Final = 23
+MARGIN_HEIGHT: Final = 3
+
+# Bitmask of a row with every column occupied
+FULL_ROW: Final = (1 << BOARD_WIDTH) - 1
+
+# Zobrist keys for every block of the board, for every row's possible contents,
+# and for every position of every tetromino state, indexed [shapeId][state][row * BOARD_WIDTH + col]
+CELL_KEYS: Final = randomKeys(BOARD_WIDTH * BOARD_HEIGHT)
+ROW_KEYS: Final = buildRowKeys(CELL_KEYS, BOARD_WIDTH, BOARD_HEIGHT)
+PIECE_KEYS: Final = tuple(
+    tuple(tuple(randomKeys(BOARD_WIDTH * BOARD_HEIGHT)) for state in range(0, 4)) for shapeId in range(0, len(TETROMINO_TYPES))
+)
+
+# A snapshot is a fixed size record:
+#   board hash, seed, tetrominos drawn, frame, shapeId, state, row, col, spun, game over, held shapeId (HELD_NONE if none),
+#   back to back, combo, then the board's row bitmasks, column heights and colors, then the garbage queue
+SNAPSHOT_FORMAT: Final = struct.Struct(
+    "<QQQIBBbb??B?B" + str(BOARD_HEIGHT) + "H" + str(BOARD_WIDTH) + "B" + str(BOARD_WIDTH * BOARD_HEIGHT) + "s"
+    + str(GARBAGE_QUEUE_SLOTS * 2) + "s"
+)
+SNAPSHOT_SIZE: Final = SNAPSHOT_FORMAT.size
+HELD_NONE: Final = 0xff
+
+# Every block of the board
+ALL_CELLS: Final = frozenset((row, col) for row in range(0, BOARD_HEIGHT) for col in range(0, BOARD_WIDTH))
+
+# Inputs that can be applied to a game
+class Action(Enum):
+    NONE = 0
+    LEFT = 1
+    RIGHT = 2
+    CW = 3
+    CCW = 4
+    REVERSE = 5
+    SOFT_DROP = 6
+    HARD_DROP = 7
+    HOLD = 8
+
+# GameManager method each Action calls
+ACTION_METHODS: Final = {
+    Action.LEFT: "moveLeft",
+    Action.RIGHT: "moveRight",
+    Action.CW: "cw",
+    Action.CCW: "ccw",
+    Action.REVERSE: "reverse",
+    Action.SOFT_DROP: "softDrop",
+    Action.HARD_DROP: "hardDrop",
+    Action.HOLD: "hold"
+}
+
+# Action values below this do something. Hold isn't implemented yet, so it's left out of what the environment and
+# server accept
+PLAYABLE_ACTION_COUNT: Final = Action.HOLD.value
 
 # Starting coordinate for tetrominos
 STARTING_COORD_ROW: Final = 1
 STARTING_COORD_COL: Final = 4
+STARTING_COORDS: Final = (STARTING_COORD_ROW, STARTING_COORD_COL)
 
-def soundMove():
-    winsound.Beep(100, 10)
-    
-def soundHardDrop():
-    winsound.Beep(80, 50)
-    
-def soundRotate():
-    winsound.PlaySound(r"C:\Windows\Media\Windows Navigation Start.wav", winsound.SND_ASYNC)    
-    
-def soundLineClearedAny():
-    winsound.PlaySound(r"C:\Windows\Media\Windows Default.wav", winsound.SND_ASYNC)
+class Board(object):
+    def __init__(self, cells = None):
+        # Each row is a bitmask of placed blocks, bit n being column n
+        self.rows = [0] * BOARD_HEIGHT
 
-def soundLineClearedTetris():
-    winsound.PlaySound(r"C:\Windows\Media\Speech On.wav", winsound.SND_ASYNC)
+        # Color plane: one palette index per cell, 0 being an empty cell
+        # It's only ever written in place, so any writable buffer of the right size can be given instead,
+        # e.g. a slice of one shared by many boards. It has to start out empty
+        if (cells is None):
+            cells = bytearray(BOARD_WIDTH * BOARD_HEIGHT)
+        self.cells = cells
 
-class Board(object):
-    def __init__(self):
-        # Create an empty board of Block objects
-        self.blockGrid = [[Block(0, 0) for x in range(BOARD_WIDTH)] for y in range(BOARD_HEIGHT)] 
-        
-        # Set margin color blocks
-        for row in range(0, 3):
+        # Height of the highest placed block in each column, 0 being an empty column
+        self.heights = [0] * BOARD_WIDTH
+
+        # Zobrist hash of the placed blocks, kept up to date as they change
+        self.hash = 0
+
+        # (row, col) of every block that changed since the changes were last collected
+        self.changedCells = set()
+
+    # Copy for searching ahead. Changed blocks aren't carried over
+    def copy(self):
+        board = Board.__new__(Board)
+        board.rows = list(self.rows)
+        board.cells = bytearray(self.cells)
+        board.heights = list(self.heights)
+        board.hash = self.hash
+        board.changedCells = set()
+        return board
+
+    def isOccupied(self, row, col):
+        return (self.rows[row] >> col) & 1 == 1
+
+    def fits(self, coords):
+        return self.fitsAt(coords, 0, 0)
+
+    # True if none of the relative cells, offset by (row, col), are outside of the board or on a placed block
+    def fitsAt(self, cells, row, col):
+        rows = self.rows
+        for relRow, relCol in cells:
+            checkRow = row + relRow
+            checkCol = col + relCol
+            if ((checkRow >= BOARD_HEIGHT or checkRow < 0) or (checkCol >= BOARD_WIDTH or checkCol < 0)):
+                return False
+            if (rows[checkRow] & (1 << checkCol)):
+                return False
+        return True
+
+    # Rows the relative cells, offset by (row, col), can fall before landing on something
+    # bottoms holds the lowest cell of each column, see STATE_BOTTOMS
+    def dropDistance(self, cells, bottoms, row, col):
+        distance = BOARD_HEIGHT
+        for relCol, relRow in bottoms:
+            # The highest block of the column is the first thing the cell can land on
+            surfaceRow = BOARD_HEIGHT - self.heights[col + relCol]
+            checkRow = row + relRow
+            if (checkRow >= surfaceRow):
+                # The cell is under an overhang, so drop a row at a time instead
+                distance = 0
+                while (self.fitsAt(cells, row + distance + 1, col)):
+                    distance += 1
+                return distance
+            distance = min(distance, surfaceRow - 1 - checkRow)
+        return distance
+
+    def place(self, coords, colorId):
+        for row, col in coords:
+            if (not (self.rows[row] >> col) & 1):
+                self.hash ^= CELL_KEYS[row * BOARD_WIDTH + col]
+            self.rows[row] |= 1 << col
+            self.cells[row * BOARD_WIDTH + col] = colorId
+            self.changedCells.add((row, col))
+            self.heights[col] = max(self.heights[col], BOARD_HEIGHT - row)
+
+    def remove(self, row, col):
+        if ((self.rows[row] >> col) & 1):
+            self.hash ^= CELL_KEYS[row * BOARD_WIDTH + col]
+        self.rows[row] &= ~(1 << col)
+        self.cells[row * BOARD_WIDTH + col] = 0
+        self.changedCells.add((row, col))
+        if (self.heights[col] == BOARD_HEIGHT - row):
+            self.__updateHeights(row)
+
+    # Recompute the column heights from the given row down
+    def __updateHeights(self, fromRow):
+        for col in range(0, BOARD_WIDTH):
+            if (self.heights[col] <= BOARD_HEIGHT - fromRow):
+                self.heights[col] = 0
+
+        # Each row sets the height of the columns that haven't had a block above it
+        unset = FULL_ROW
+        for col in range(0, BOARD_WIDTH):
+            if (self.heights[col] > 0):
+                unset &= ~(1 << col)
+        for row in range(fromRow, BOARD_HEIGHT):
+            found = self.rows[row] & unset
+            while (found):
+                col = (found & -found).bit_length() - 1
+                self.heights[col] = BOARD_HEIGHT - row
+                found &= found - 1
+            unset &= ~self.rows[row]
+            if (unset == 0):
+                break
+
+    # Move the changed blocks into the given set
+    def collectChanges(self, cells):
+        if (len(self.changedCells) > 0):
+            cells.update(self.changedCells)
+            self.changedCells.clear()
+
+    # Remove full rows, moving everything above them down
+    # Only the given rows are checked (e.g. the rows a placed tetromino touched), or the whole board if none are given
+    def clearFullRows(self, checkRows = None):
+        if (checkRows is None):
+            checkRows = range(0, BOARD_HEIGHT)
+
+        lowestCleared = -1
+        for row in checkRows:
+            if (self.rows[row] == FULL_ROW and row > lowestCleared):
+                lowestCleared = row
+        if (lowestCleared < 0):
+            return 0
+
+        # Compact every row that isn't full toward the bottom in a single pass
+        # Rows below the lowest full one don't move
+        linesCleared = 0
+        oldRows = self.rows[0:lowestCleared + 1]
+        oldCells = bytes(self.cells[0:(lowestCleared + 1) * BOARD_WIDTH])
+        dest = lowestCleared
+        for row in range(lowestCleared, -1, -1):
+            if (self.rows[row] == FULL_ROW):
+                linesCleared += 1
+                continue
+
+            if (dest != row):
+                self.rows[dest] = self.rows[row]
+                self.cells[dest * BOARD_WIDTH:(dest + 1) * BOARD_WIDTH] = self.cells[row * BOARD_WIDTH:(row + 1) * BOARD_WIDTH]
+            dest -= 1
+
+        # Empty the rows left at the top of the board
+        for row in range(0, dest + 1):
+            self.rows[row] = 0
+            self.cells[row * BOARD_WIDTH:(row + 1) * BOARD_WIDTH] = bytes(BOARD_WIDTH)
+
+        self.__updateHeights(0)
+
+        # Swap the moved rows' old contents out of the hash, and their new contents in
+        for row in range(0, lowestCleared + 1):
+            self.hash ^= rowHash(ROW_KEYS, row, oldRows[row]) ^ rowHash(ROW_KEYS, row, self.rows[row])
+
+        # Only the rows from the lowest cleared one up can have moved. Keep the blocks whose color changed
+        for row in range(0, lowestCleared + 1):
+            for col in range(0, BOARD_WIDTH):
+                if (oldCells[row * BOARD_WIDTH + col] != self.cells[row * BOARD_WIDTH + col]):
+                    self.changedCells.add((row, col))
+
+        return linesCleared
+
+    # Push everything up by the given number of rows, filling the bottom with garbage rows open at the hole column
+    # Rows are shifted in place, so nothing is reallocated however many go in
+    # Returns True if placed blocks were pushed off the top of the board
+    def insertGarbage(self, lines, hole, colorId = GARBAGE_COLOR_ID):
+        lines = min(lines, BOARD_HEIGHT)
+        if (lines <= 0):
+            return False
+
+        # Rows above the stack are empty before and after, so only the ones from lines above it down change
+        top = BOARD_HEIGHT - max(self.heights)
+        toppedOut = top < lines
+        firstChanged = max(0, top - lines)
+        oldRows = self.rows[firstChanged:]
+        oldCells = bytes(self.cells[firstChanged * BOARD_WIDTH:])
+
+        garbageRow = FULL_ROW & ~(1 << hole)
+        del self.rows[0:lines]
+        self.rows.extend([garbageRow] * lines)
+
+        split = (BOARD_HEIGHT - lines) * BOARD_WIDTH
+        with memoryview(self.cells) as cells:
+            cells[0:split] = cells[lines * BOARD_WIDTH:]
+        garbageCells = bytearray((colorId,)) * BOARD_WIDTH
+        garbageCells[hole] = 0
+        self.cells[split:] = garbageCells * lines
+
+        if (toppedOut):
+            self.__updateHeights(0)
+        else:
             for col in range(0, BOARD_WIDTH):
-                self.blockGrid[row][col].setColor(MARGIN_COLOR)
+                if (self.heights[col] > 0):
+                    self.heights[col] += lines
+                elif (col != hole):
+                    self.heights[col] = lines
+
+        # Stacks are often made of identical rows, which shifting leaves as they were
+        for row in range(firstChanged, BOARD_HEIGHT):
+            oldRow = oldRows[row - firstChanged]
+            if (oldRow != self.rows[row]):
+                self.hash ^= rowHash(ROW_KEYS, row, oldRow) ^ rowHash(ROW_KEYS, row, self.rows[row])
+            start = row * BOARD_WIDTH
+            oldStart = start - firstChanged * BOARD_WIDTH
+            if (oldCells[oldStart:oldStart + BOARD_WIDTH] != self.cells[start:start + BOARD_WIDTH]):
+                for col in range(0, BOARD_WIDTH):
+                    if (oldCells[oldStart + col] != self.cells[start + col]):
+                        self.changedCells.add((row, col))
+
+        return toppedOut
+
+    def getColor(self, row, col):
+        colorId = self.cells[row * BOARD_WIDTH + col]
+        if (colorId != 0):
+            return PALETTE[colorId]
+        elif (row < MARGIN_HEIGHT):
+            return MARGIN_COLOR
+        return BASE_COLOR
     
 class GameManager(object):
-    def __init__(self):
+    # The seed decides the order of the tetrominos. Without one, a random seed is picked
+    # A recorded game keeps every input applied through perform, every tick and every test block, see getRecording
+    def __init__(self, seed = None, previewLength = 5, record = False):
         self.board = Board()
-        self.__currentBag = self.__createBag()
-        self.__nextBag = self.__createBag()
+        self.gameOver = False
+        self.__listeners = []
+
+        # Blocks covered by the current tetromino, and the blocks that changed during the last update
+        self.currentCoords = []
+        self.dirtyCells = set()
+        self.__dropDistance = None
+
+        self.pieces = PieceGenerator(seed, previewLength)
+
+        # Garbage received and not on the board yet, whether the last clear was a tetris or T-spin,
+        # and the number of placements in a row that cleared lines
+        self.garbage = GarbageQueue()
+        self.backToBack = False
+        self.combo = 0
+
+        # Ticks so far
+        self.frame = 0
+        self.recorder = None
+        if (record):
+            self.recorder = ReplayRecorder(self.pieces.seed)
+
+        self.currentMino = Tetromino(TETROMINO_TYPES[self.pieces.peek(1)[0].value])
         self.__nextTetromino()
         self.__doTick = True
 
+    # Listeners are notified of game events. With none attached, the game runs headless
+    def addListener(self, listener):
+        self.__listeners.append(listener)
+
+    def removeListener(self, listener):
+        self.__listeners.remove(listener)
+
     # Run after every timer tick
     def tick(self):
-        if (self.__doTick):
+        self.frame += 1
+        if (self.__doTick and not self.gameOver):
             #self.__drop()
             self.__updateBoard()
         
     def __drop(self):
         # Attempt to drop the current tetromino down by 1 row
         self.currentMino.prevAbsCoords = self.currentMino.absCoords
-        absCoords = self.getAbsoluteCoords(self.currentMino.currentState) # Get absolute coordinates of the current tetromino
 
         # Ensure that the current mino won't collide with anything present
-        checks = [False, False, False, False]
-        
-        for i in range(0, 4):
-            row, col = absCoords[i]
-            checkRow = row + 1
-            if (checkRow < BOARD_HEIGHT): # Make sure the desired move isn't past the board wall
-                if (not self.board.blockGrid[checkRow][col].isOccupied):
-                    checks[i] = True
-                elif ((checkRow, col) in absCoords): # The block is occupied, but is it because it's part of the current mino?
-                    checks[i] = True # If so, we're safe  
-                
-        # If all True, then we're good to drop 1 row
-        if (all(checks)):
+        if (self.__canMove(1, 0)):
             row, col = self.currentMino.absCoords
             self.currentMino.absCoords = (row + 1, col)
+            self.currentMino.spun = False
 
     def __updateBoard(self):
         #print("Current state: "+ str(self.currentMino.currentState), "Prev state: " + str(self.currentMino.prevState), "absCoords:", self.currentMino.absCoords, "prevAbsCoords:", self.currentMino.prevAbsCoords)
         #print("------------------------")
 
-        # Remove old state blocks
-        for row in range(0, BOARD_HEIGHT):
-            for col in range(0, BOARD_WIDTH):
-                if (self.board.blockGrid[row][col].isCurrent and (not self.board.blockGrid[row][col].isPlaced)):
-                    self.board.blockGrid[row][col] = EMPTY_BLOCK
-                    
-        # Refresh the current tetromino's block state
-        #self.__updateMinoState(0)
-        self.currentMino.updateCurrentBlockState()
-
-        # Place current state blocks
-        blockCoords = self.getAbsoluteCoords(self.currentMino.currentState)   
-        currentBlocks = self.currentMino.getStateBlocks(self.currentMino.currentState)
-        for i in range(0, 4):
-            row, col = blockCoords[i]
-            self.board.blockGrid[row][col] = currentBlocks[i]
+        # The current tetromino is kept off of the board until it is placed
+        # Only the blocks it left or moved onto changed, along with anything changed on the board itself
+        prevCoords = self.currentCoords
+        self.currentCoords = self.getAbsoluteCoords(self.currentMino.currentState)
+        self.__dropDistance = None
+        dirtyCells = set(prevCoords)
+        dirtyCells.symmetric_difference_update(self.currentCoords)
+        self.board.collectChanges(dirtyCells)
+        self.dirtyCells = dirtyCells
+
+        if (len(dirtyCells) > 0):
+            for listener in self.__listeners:
+                listener.onUpdate(dirtyCells)
 
     def __updateMinoState(self, inc):
         # Update state so game board knows what to refresh
@@ -111,331 +376,121 @@ class GameManager(object):
         elif (self.currentMino.currentState == -1): # Wrap -1 around to 3
             self.currentMino.currentState = 3
             
-    def __createBag(self):
-        bag = [Bag.O, Bag.I, Bag.J, Bag.L, Bag.S, Bag.Z, Bag.T]
-        random.shuffle(bag)
-        return bag
-
-    def __EnumToMino(self, enum):
-        if (enum.value == 0):
-            return O()
-        elif (enum.value == 1):
-            return I()
-        elif (enum.value == 2):
-            return J()
-        elif (enum.value == 3):
-            return L()
-        elif (enum.value == 4):
-            return S()
-        elif (enum.value == 5):
-            return Z()
-        elif (enum.value == 6):
-            return T()
-
-    def __nextTetromino(self):
-        self.currentMino = self.__EnumToMino(self.__currentBag[0])
-        del self.__currentBag[0]
-        
-        if (len(self.__currentBag) == 0):
-            self.__currentBag = self.__nextBag
-            self.__nextBag = self.__createBag()
-        
-        self.currentMino.absCoords = (STARTING_COORD_ROW, STARTING_COORD_COL)
+    def __nextTetromino(self, toppedOut = False):
+        # The same Tetromino is reused, only its type and position change
+        self.currentMino.spawn(TETROMINO_TYPES[next(self.pieces).value], STARTING_COORDS)
         self.__updateBoard()
+
+        for listener in self.__listeners:
+            listener.onSpawn(self.currentMino)
+
+        # The game is over once a tetromino spawns on top of placed blocks, or garbage pushed blocks off the board
+        if (toppedOut or not self.board.fits(self.currentCoords)):
+            self.gameOver = True
+            for listener in self.__listeners:
+                listener.onGameOver()
         
+    # Zobrist hash of the board and the current tetromino's state and position
+    def getHash(self):
+        mino = self.currentMino
+        row, col = mino.absCoords
+        return self.board.hash ^ PIECE_KEYS[mino.shapeId][mino.currentState][row * BOARD_WIDTH + col]
+
+    # Upcoming tetrominos as Bag values, next one first. Defaults to the preview length
+    def getPreview(self, count = None):
+        return self.pieces.peek(count)
+
     def getAbsoluteCoords(self, desiredState):
-        absCoords = [(0,0), (0,0), (0,0), (0,0)]
-        
         # 4 blocks in a given state
-        state = self.currentMino.getStateBlocks(desiredState)
-        for i in range (0, 4):
-            absRow, absCol = self.currentMino.absCoords
-            relRow, relCol = state[i].relCoords
-            absCoords[i] = (absRow + relRow, absCol + relCol)
-                
-        return absCoords
-    
-    # For J, L, S, T, and Z tetrominos (SRS)
-    def __attemptKick(self, direction):
-        # Attempt to rotate the mino in place
-        # If it fails, then we need to test the mino in 4 different "kick" states
-        # If none of the tests pass, the mino does not move, and stays in its current state
+        absRow, absCol = self.currentMino.absCoords
+        return [(absRow + relRow, absCol + relCol) for relRow, relCol in STATE_CELLS[self.currentMino.shapeId][desiredState]]
 
-        self.currentMino.prevState = self.currentMino.currentState 
+    # Rows the current tetromino can fall. Cached until it or the board changes
+    def getDropDistance(self):
+        if (self.__dropDistance is None):
+            mino = self.currentMino
+            row, col = mino.absCoords
+            self.__dropDistance = self.board.dropDistance(
+                STATE_CELLS[mino.shapeId][mino.currentState], STATE_BOTTOMS[mino.shapeId][mino.currentState], row, col
+            )
+        return self.__dropDistance
 
-        # Determine the state the tetromino is trying to change to
-        desiredState = self.currentMino.currentState + direction
-        if (desiredState == 4): # Wrap 4 around to 0
-            desiredState = 0
-        if (desiredState == 5): # Wrap 3 around to 1 (mino was reversed)
-            desiredState = 1
-        elif (desiredState == -1): # Wrap -1 around to 3
-            desiredState = 3
-            
-        passingCoords = None
-
-        # 0 = spawn state
-        if (self.currentMino.currentState == 0):
-            # 0 -> R
-            if (direction == 1):
-                passingCoords = self.__testKicks(desiredState, [(0,0), (-1,0), (-1,1), (0,-2), (-1,-2)])
-            # 0 -> L
-            elif (direction == -1):
-                passingCoords = self.__testKicks(desiredState, [(0,0), (1,0), (1,1), (0,-2), (1,-2)])
-            # 0 -> 2
-            elif (direction == 2):
-                # TODO
-                pass
-            
-        # 1 = R
-        elif (self.currentMino.currentState == 1):
-            # R -> 2
-            if (direction == 1):
-                passingCoords = self.__testKicks(desiredState, [(0,0), (1,0), (1,-1), (0,2), (1,2)])
-            # R -> 0
-            elif (direction == -1):
-                passingCoords = self.__testKicks(desiredState, [(0,0), (1,0), (1,-1), (0,2), (1,2)])
-            # R -> L
-            elif (direction == 2):
-                # TODO
-                pass
-            
-        # 2 = two successive rotations
-        elif (self.currentMino.currentState == 2):
-            # 2 -> L
-            if (direction == 1):
-                passingCoords = self.__testKicks(desiredState, [(0,0), (1,0), (1,1), (0,-2), (1,-2)])
-            # 2 -> R
-            elif (direction == -1):
-                passingCoords = self.__testKicks(desiredState, [(0,0), (-1,0), (-1,1), (0,-2), (-1,-2)])
-            # 2 -> 0
-            elif (direction == 2):
-                # TODO
-                pass
-            
-        # 3 = L
-        elif (self.currentMino.currentState == 3):
-            # L -> 0
-            if (direction == 1):
-                passingCoords = self.__testKicks(desiredState, [(0,0), (-1,0), (-1,-1), (0,2), (-1,2)])
-            # L -> 2
-            elif (direction == -1):
-                passingCoords = self.__testKicks(desiredState, [(0,0), (-1,0), (-1,-1), (0,2), (-1,2)])
-            # L -> R
-            elif (direction == 2):
-                # TODO
-                pass
-            
-        # A test passed, so set the tetromino's state and coordinates to it
-        if (passingCoords is not None):
-            self.currentMino.currentState = desiredState
-            self.currentMino.absCoords = passingCoords
-            self.currentMino.spun = True
-            soundRotate()
-            self.__updateBoard()
-        else:
-            self.currentMino.spun = False
-            
-    # For I tetromino (SRS+)
-    def __attemptKickI(self, direction):
+    # Where the current tetromino would land if hard dropped
+    def getGhostCoords(self):
+        distance = self.getDropDistance()
+        return [(row + distance, col) for row, col in self.currentCoords]
+
+    def __canMove(self, rowOffset, colOffset):
+        row, col = self.currentMino.absCoords
+        return self.board.fitsAt(STATE_CELLS[self.currentMino.shapeId][self.currentMino.currentState], row + rowOffset, col + colOffset)
+
+    # Color of a block, including the current tetromino which isn't placed on the board yet
+    def getBlockColor(self, row, col):
+        if ((row, col) in self.currentCoords):
+            return PALETTE[self.currentMino.colorId]
+        return self.board.getColor(row, col)
+    
+    def __rotate(self, direction):
         # Attempt to rotate the mino in place
-        # If it fails, then we need to test the mino in 4 different "kick" states
+        # If it fails, then we need to test the mino in 4 (5 for 180 degrees) different "kick" states
         # If none of the tests pass, the mino does not move, and stays in its current state
-
-        self.currentMino.prevState = self.currentMino.currentState
+        mino = self.currentMino
+        mino.prevState = mino.currentState
 
         # Determine the state the tetromino is trying to change to
-        desiredState = self.currentMino.currentState + direction
-        if (desiredState == 4): # Wrap 4 around to 0
-            desiredState = 0
-        if (desiredState == 5): # Wrap 3 around to 1 (mino was reversed)
-            desiredState = 1
-        elif (desiredState == -1): # Wrap -1 around to 3
-            desiredState = 3
-            
-        passingCoords = None
-        rowWobble = colWobble = 0 # Offsets
-
-        # 0 = spawn state
-        if (self.currentMino.currentState == 0):
-            # 0 -> R
-            if (direction == 1):
-                row, col = self.currentMino.absCoords
-                rowWobble = 0
-                colWobble = 1
-                self.currentMino.absCoords = (row + rowWobble, col + colWobble)
-                passingCoords = self.__testKicks(desiredState, [(0,0), (-2,0), (1,0), (-2,-1), (1,2)])
-            # 0 -> L
-            elif (direction == -1):
-                row, col = self.currentMino.absCoords
-                rowWobble = 1
-                colWobble = 0
-                self.currentMino.absCoords = (row + rowWobble, col + colWobble)
-                passingCoords = self.__testKicks(desiredState, [(0,0), (-1,0), (2,0), (-1,2), (2,-1)])
-            # 0 -> 2
-            elif (direction == 2):
-                # TODO
-                pass
-            
-        # 1 = R
-        elif (self.currentMino.currentState == 1):
-            # R -> 2
-            if (direction == 1):
-                row, col = self.currentMino.absCoords
-                rowWobble = 1
-                colWobble = 0
-                self.currentMino.absCoords = (row + rowWobble, col + colWobble)
-                passingCoords = self.__testKicks(desiredState, [(0,0), (-1,0), (2,0), (-1,2), (2,-1)])
-            # R -> 0
-            elif (direction == -1):
-                row, col = self.currentMino.absCoords
-                rowWobble = 0
-                colWobble = -1
-                self.currentMino.absCoords = (row + rowWobble, col + colWobble)
-                passingCoords = self.__testKicks(desiredState, [(0,0), (2,0), (-1,0), (2,1), (-1,-2)])
-            # R -> L
-            elif (direction == 2):
-                # TODO
-                pass
-            
-        # 2 = two successive rotations
-        elif (self.currentMino.currentState == 2):
-            # 2 -> L
-            if (direction == 1):
-                row, col = self.currentMino.absCoords
-                rowWobble = 0
-                colWobble = -1
-                self.currentMino.absCoords = (row + rowWobble, col + colWobble)
-                passingCoords = self.__testKicks(desiredState, [(0,0), (2,0), (-1,0), (2,1), (-1,-2)])
-            # 2 -> R
-            elif (direction == -1):
-                row, col = self.currentMino.absCoords
-                rowWobble = -1
-                colWobble = 0
-                self.currentMino.absCoords = (row + rowWobble, col + colWobble)
-                passingCoords = self.__testKicks(desiredState, [(0,0), (1,0), (-2,0), (1,-2), (-2,1)])
-            # 2 -> 0
-            elif (direction == 2):
-                # TODO
-                pass
-            
-        # 3 = L
-        elif (self.currentMino.currentState == 3):
-            # L -> 0
-            if (direction == 1):
-                row, col = self.currentMino.absCoords
-                rowWobble = -1
-                colWobble = 0
-                self.currentMino.absCoords = (row + rowWobble, col + colWobble)
-                passingCoords = self.__testKicks(desiredState, [(0,0), (1,0), (-2,0), (1,-2), (-2,1)])
-            # L -> 2
-            elif (direction == -1):
-                row, col = self.currentMino.absCoords
-                rowWobble = 0
-                colWobble = 1
-                self.currentMino.absCoords = (row + rowWobble, col + colWobble)
-                passingCoords = self.__testKicks(desiredState, [(0,0), (-2,0), (1,0), (-2,-1), (1,2)])
-            # L -> R
-            elif (direction == 2):
-                # TODO
-                pass
-            
-        # A test passed, so set the tetromino's state and coordinates to it
-        if (passingCoords is not None):
-            self.currentMino.currentState = desiredState
-            self.currentMino.absCoords = passingCoords
-            row, col = self.currentMino.absCoords
-            soundRotate()
-            self.__updateBoard()
+        desiredState = rotatedState(mino.currentState, direction)
 
-    def __testKicks(self, desiredState, tests):
-        # Absolute coordinates for the state we're rotating to
-        absCoords = self.getAbsoluteCoords(desiredState)
-        
-        for i, test in enumerate(tests):
-            blockPassed = [True, True, True, True]
-            x, y = test
-            y = y * -1 # Flip because we start Y from the top rather than the bottom
-            for j, coord in enumerate(absCoords):
-                row, col = coord
-                testY = row + y
-                testX = col + x
-                # Tested block goes outside of the board. Test failed
-                if ((testY >= BOARD_HEIGHT or testY < 0) or (testX >= BOARD_WIDTH or testX < 0)):
-                    blockPassed[j] = False
-                    break
-                # See if the desired block position is occupied. If so, the test fails
-                # And ensure the block isn't part of the current tetromino
-                elif (self.board.blockGrid[testY][testX].isOccupied):
-                    if ((testY, testX) not in self.getAbsoluteCoords(self.currentMino.currentState) 
-                        #and not ((testY, testX) in absCoords)
-                        and self.board.blockGrid[testY][testX].isPlaced):
-                        blockPassed[j] = False
-                        break
-                
-            # Return the passing test's absolute coordinates
-            if (all(blockPassed)):
-                row, col = absCoords[0]
-                return (row + y, col + x)
-        
-        # No tests passed. The mino does not change states
-        return None
+        # The kicks are precomputed, so each test is a lookup and a collision check
+        row, col = mino.absCoords
+        for rowOffset, colOffset, cells in ROTATIONS[mino.shapeId][mino.currentState][desiredState]:
+            # A test passed, so set the tetromino's state and coordinates to it
+            if (self.board.fitsAt(cells, row, col)):
+                mino.currentState = desiredState
+                mino.absCoords = (row + rowOffset, col + colOffset)
+                mino.spun = True
+                self.__updateBoard()
+                for listener in self.__listeners:
+                    listener.onRotate()
+                return
+
+        # None did, so nothing moved and spun stays as the last move that did left it
     
     def cw(self):
-        if (self.currentMino.shape == "I"):
-            self.__attemptKickI(1)
-        else:
-            self.__attemptKick(1)
+        if (self.gameOver):
+            return
+        self.__rotate(1)
 
     def ccw(self):
-        if (self.currentMino.shape == "I"):
-            self.__attemptKickI(-1)
-        else:
-            self.__attemptKick(-1)
+        if (self.gameOver):
+            return
+        self.__rotate(-1)
         
     def reverse(self):
-        if (self.currentMino.shape == "I"):
-            self.__attemptKickI(2)
-        else:
-            self.__attemptKick(2)
+        if (self.gameOver):
+            return
+        self.__rotate(2)
 
     def softDrop(self):
+        if (self.gameOver):
+            return
         self.__drop()
         self.__updateBoard()
         
     def hardDrop(self):
+        if (self.gameOver):
+            return
+
         # Pause ticking while checking
         self.__doTick = False        
 
         self.currentMino.prevAbsCoords = self.currentMino.absCoords
 
-        # Assume everything is good unless something is found
-        checks = [True, True, True, True]
-        absCoords = self.getAbsoluteCoords(self.currentMino.currentState)
-        row, col = absCoords[0]
-        
-        while(all(checks) and row < BOARD_HEIGHT - 1):
-            for i in range(0, 4):
-                row, col = absCoords[i]
-                checkRow = row + 1
-                
-                if (checkRow > BOARD_HEIGHT - 1):                
-                    checks[i] = False # We're at the furthest point; stop
-                    break
-                
-                if (self.board.blockGrid[checkRow][col].isOccupied):
-                    if((checkRow, col) not in absCoords): # The block is occupied, but is it because it's part of the current mino?
-                        checks[i] = False # Something else is occupying the block below. Stop above it
-                        break
-                    
-
-            # If all True, then we're good to drop a row
-            if (all(checks)):
-                row, col = absCoords[0]
-                row += 1
-                self.currentMino.absCoords = (row, col) # Only sets absolute for center block
-                absCoords = self.getAbsoluteCoords(self.currentMino.currentState) # Get all absolute coordinates
-                
+        # Drop straight onto whatever is below the tetromino. Falling any distance isn't a spin
+        row, col = self.currentMino.absCoords
+        distance = self.getDropDistance()
+        self.currentMino.absCoords = (row + distance, col) # Only sets absolute for center block
+        if (distance > 0):
+            self.currentMino.spun = False
                 
         # Furthest drop point found
         self.__updateBoard()
@@ -444,98 +499,160 @@ class GameManager(object):
         self.__doTick = True
         
     def __tetrominoPlaced(self):
-        self.currentMino.tetrominoPlaced()
-        self.__checkRowsCompleted()
-        self.__nextTetromino()
+        tSpin = self.__isTSpin()
+        self.board.place(self.getAbsoluteCoords(self.currentMino.currentState), self.currentMino.colorId)
+        linesCleared = self.__checkRowsCompleted()
+        self.__nextTetromino(self.__attack(linesCleared, tSpin))
+
+    # A T whose last move was a rotation, with at least 3 of the 4 blocks diagonal to its center taken
+    # (the walls and floor count as taken)
+    def __isTSpin(self):
+        mino = self.currentMino
+        if (mino.shapeId != Bag.T.value or not mino.spun):
+            return False
+        row, col = mino.absCoords
+        corners = 0
+        for cornerRow, cornerCol in ((row - 1, col - 1), (row - 1, col + 1), (row + 1, col - 1), (row + 1, col + 1)):
+            if (cornerRow < 0 or cornerRow >= BOARD_HEIGHT or cornerCol < 0 or cornerCol >= BOARD_WIDTH):
+                corners += 1
+            elif (self.board.isOccupied(cornerRow, cornerCol)):
+                corners += 1
+        return corners >= 3
+
+    # Clears attack, cancelling garbage waiting to come in first. Placements that clear nothing let the garbage in
+    # Returns True if the garbage pushed blocks off the board
+    def __attack(self, linesCleared, tSpin):
+        if (linesCleared > 0):
+            attack = attackFor(linesCleared, tSpin, self.backToBack, self.combo)
+            self.backToBack = isDifficultClear(linesCleared, tSpin)
+            self.combo += 1
+            attack = self.garbage.cancel(attack)
+            if (attack > 0):
+                for listener in self.__listeners:
+                    listener.onAttack(attack)
+            return False
+
+        self.combo = 0
+        toppedOut = False
+        for lines, hole in self.garbage.take():
+            toppedOut = self.board.insertGarbage(lines, hole) or toppedOut
+        return toppedOut
+
+    # Queue lines of garbage with a hole in the given column, to come in after the next placement that clears nothing
+    def receiveGarbage(self, lines, hole):
+        lines = min(lines, BOARD_HEIGHT)
+        if (self.recorder is not None):
+            self.recorder.record(self.frame, GARBAGE_CODE, lines * BOARD_WIDTH + hole)
+        self.garbage.receive(lines, hole)
         
     def moveLeft(self):
+        if (self.gameOver):
+            return
         self.currentMino.prevAbsCoords = self.currentMino.absCoords
-        absCoords = self.getAbsoluteCoords(self.currentMino.currentState) # Get all coordinates of the current tetromino
 
         # Ensure that the current mino won't collide with anything present
-        checks = [False, False, False, False]
-        
-        for i in range(0, 4):
-            row, col = absCoords[i]
-            checkCol = col - 1
-            if (checkCol >= 0): # Make sure the desired move isn't past the board wall
-                if (not self.board.blockGrid[row][checkCol].isOccupied):
-                    checks[i] = True
-                elif ((row, checkCol) in absCoords): # The block is occupied, but is it because it's part of the current mino?
-                    checks[i] = True # If so, we're safe
-                    
-        # If all True, then we're good to move left
-        if (all(checks)):
+        if (self.__canMove(0, -1)):
             row, col = self.currentMino.absCoords
             self.currentMino.absCoords = (row, col - 1)
-            soundMove()
-            
-        self.__updateBoard()
+            self.currentMino.spun = False
+            self.__updateBoard()
+            for listener in self.__listeners:
+                listener.onMove()
         
     def moveRight(self):
+        if (self.gameOver):
+            return
         self.currentMino.prevAbsCoords = self.currentMino.absCoords
-        absCoords = self.getAbsoluteCoords(self.currentMino.currentState) # Get all coordinates of the current tetromino
 
         # Ensure that the current mino won't collide with anything present
-        checks = [False, False, False, False]
-        
-        for i in range(0, 4):
-            row, col = absCoords[i]
-            checkCol = col + 1
-            if (checkCol < BOARD_WIDTH): # Make sure the desired move isn't past the board wall
-                if (not self.board.blockGrid[row][checkCol].isOccupied):
-                    checks[i] = True
-                elif ((row, checkCol) in absCoords): # The block is occupied, but is it because it's part of the current mino?
-                    checks[i] = True # If so, we're safe  
-                
-                    
-        # If all True, then we're good to move right
-        if (all(checks)):
+        if (self.__canMove(0, 1)):
             row, col = self.currentMino.absCoords
             self.currentMino.absCoords = (row, col + 1)
-            soundMove()
-        
-        self.__updateBoard()
+            self.currentMino.spun = False
+            self.__updateBoard()
+            for listener in self.__listeners:
+                listener.onMove()
         
+    # Hold isn't implemented yet, so this does nothing
     def hold(self):
-        print("TODO: hold")
+        pass
+
+    # Apply an Action through its method. Action.NONE does nothing
+    def perform(self, action):
+        if (action != Action.NONE):
+            if (self.recorder is not None):
+                self.recorder.record(self.frame, action.value)
+            getattr(self, ACTION_METHODS[action])()
         
     def __checkRowsCompleted(self):
-        __linesCleared = 0
-        # Check from the bottom up
-        for row in range(BOARD_HEIGHT - 1, 3, -1):
-            __blocksOccupiedInRow = 0
-            for col in range(0, BOARD_WIDTH):
-                if (self.board.blockGrid[row][col].isOccupied):
-                    __blocksOccupiedInRow += 1
-                    
-            # Clear the line
-            if (__blocksOccupiedInRow == 10):
-                __linesCleared += 1
-                del self.board.blockGrid[row] # Special case !!!
-                    
-        print("Lines cleared: ", str(__linesCleared))
-        # Insert empty rows at top of board
-        for i in range(__linesCleared):
-            self.board.blockGrid.insert(3, [EMPTY_BLOCK for i in range(10)])
-                
-        # Play a sound based on number of lines cleared
-        if (__linesCleared <= 0):
-            soundHardDrop()
-        if (__linesCleared > 0 and __linesCleared < 4):
-            soundLineClearedAny()
-        elif (__linesCleared >= 4):
-            soundLineClearedTetris()
-
-    def createTestBlock(self, event):
-        testBlock = Block()
-        testBlock.isOccupied = True
-        testBlock.isPlaced = True
-        testBlock.setColor(TEST_COLOR)
-        row, col = event.widget.absCoords
-        self.board.blockGrid[row][col] = testBlock
+        # Full rows are removed and everything above them moves down
+        # Only the rows the tetromino was placed on can have filled up
+        __linesCleared = self.board.clearFullRows(set(row for row, col in self.currentCoords))
+
+        for listener in self.__listeners:
+            listener.onPlaced(__linesCleared)
+        return __linesCleared
+
+    def createTestBlock(self, row, col):
+        if (self.recorder is not None):
+            self.recorder.record(self.frame, CREATE_TEST_BLOCK_CODE, row * BOARD_WIDTH + col)
+        self.board.place([(row, col)], TEST_COLOR_ID)
+        self.__dropDistance = None
     
-    def destroyTestBlock(self, event):
-        row, col = event.widget.absCoords
-        self.board.blockGrid[row][col] = EMPTY_BLOCK
-    
\ No newline at end of file
+    def destroyTestBlock(self, row, col):
+        if (self.recorder is not None):
+            self.recorder.record(self.frame, DESTROY_TEST_BLOCK_CODE, row * BOARD_WIDTH + col)
+        self.board.remove(row, col)
+        self.__dropDistance = None
+
+    # The game so far as a compact binary recording, or None if it isn't being recorded
+    def getRecording(self):
+        if (self.recorder is None):
+            return None
+        return self.recorder.finish(self.frame, self.getHash())
+
+    # Everything needed to carry on from this point later with restore, as SNAPSHOT_SIZE bytes
+    def snapshot(self):
+        mino = self.currentMino
+        board = self.board
+        row, col = mino.absCoords
+        return SNAPSHOT_FORMAT.pack(
+            board.hash, self.pieces.seed, self.pieces.position, self.frame,
+            mino.shapeId, mino.currentState, row, col, mino.spun, self.gameOver, HELD_NONE,
+            self.backToBack, min(self.combo, 0xff),
+            *board.rows, *board.heights, bytes(board.cells), bytes(self.garbage.toBytes())
+        )
+
+    # Go back to a snapshot, which can be any buffer holding one (bytes, a memoryview of an archive, ...)
+    # The board is overwritten in place. Listeners get every block as changed
+    def restore(self, snapshot):
+        fields = SNAPSHOT_FORMAT.unpack_from(snapshot)
+        boardHash, seed, position, frame, shapeId, state, row, col, spun, gameOver, held, backToBack, combo = fields[0:13]
+        board = self.board
+        board.hash = boardHash
+        board.rows[:] = fields[13:13 + BOARD_HEIGHT]
+        board.heights[:] = fields[13 + BOARD_HEIGHT:13 + BOARD_HEIGHT + BOARD_WIDTH]
+        board.cells[:] = fields[-2]
+        board.changedCells.clear()
+        self.garbage.fromBytes(fields[-1])
+        self.backToBack = backToBack
+        self.combo = combo
+
+        mino = self.currentMino
+        mino.spawn(TETROMINO_TYPES[shapeId], (row, col))
+        mino.currentState = state
+        mino.prevState = state
+        mino.spun = spun
+
+        if (seed != self.pieces.seed):
+            self.pieces = PieceGenerator(seed, self.pieces.previewLength)
+        self.pieces.seek(position)
+        self.frame = frame
+        self.gameOver = gameOver
+        self.__doTick = True
+
+        self.currentCoords = self.getAbsoluteCoords(state)
+        self.__dropDistance = None
+        self.dirtyCells = set(ALL_CELLS)
+        for listener in self.__listeners:
+            listener.onUpdate(self.dirtyCells)
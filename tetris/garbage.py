@@ -0,0 +1,92 @@
+from typing import Final
+from collections import deque
+
+# Lines of garbage sent for clearing 0 to 4 lines, and for a T-spin clearing 0 to 3
+LINE_ATTACK: Final = (0, 0, 1, 2, 4)
+T_SPIN_ATTACK: Final = (0, 2, 4, 6)
+
+# Extra line for a tetris or T-spin clear right after another one, with no other clear in between
+BACK_TO_BACK_BONUS: Final = 1
+
+# Extra lines by combo, the number of placements in a row that cleared lines before this one
+COMBO_ATTACK: Final = (0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 4, 5)
+
+# Most garbage lines that go in after a single placement. The rest waits for the next one
+GARBAGE_CAP: Final = 8
+
+# Incoming attacks a queue keeps apart. Past that, more garbage is added to the last one
+GARBAGE_QUEUE_SLOTS: Final = 8
+
+# A tetris or a T-spin clear keeps back to back going. A T-spin that clears nothing doesn't break it
+def isDifficultClear(linesCleared, tSpin):
+    return linesCleared == 4 or (tSpin and linesCleared > 0)
+
+# Lines of garbage a placement sends. combo is the number of clears in a row before this one
+def attackFor(linesCleared, tSpin, backToBack, combo):
+    if (linesCleared == 0):
+        return 0
+    attack = T_SPIN_ATTACK[linesCleared] if tSpin else LINE_ATTACK[linesCleared]
+    if (backToBack and isDifficultClear(linesCleared, tSpin)):
+        attack += BACK_TO_BACK_BONUS
+    return attack + COMBO_ATTACK[min(combo, len(COMBO_ATTACK) - 1)]
+
+class GarbageQueue(object):
+    # Garbage a game has received but not put on its board yet, as (lines, hole column), oldest first
+    def __init__(self):
+        self.entries = deque()
+        self.lines = 0
+
+    def receive(self, lines, hole):
+        if (lines <= 0):
+            return
+        if (len(self.entries) < GARBAGE_QUEUE_SLOTS):
+            self.entries.append([lines, hole])
+        else:
+            self.entries[-1][0] += lines
+        self.lines += lines
+
+    # Offset an attack against the oldest garbage first. Returns the lines of the attack left over
+    def cancel(self, attack):
+        while (attack > 0 and len(self.entries) > 0):
+            entry = self.entries[0]
+            cancelled = min(attack, entry[0])
+            entry[0] -= cancelled
+            attack -= cancelled
+            self.lines -= cancelled
+            if (entry[0] == 0):
+                self.entries.popleft()
+        return attack
+
+    # Take up to maxLines of the oldest garbage, as [(lines, hole), ...]
+    def take(self, maxLines = GARBAGE_CAP):
+        taken = []
+        while (maxLines > 0 and len(self.entries) > 0):
+            entry = self.entries[0]
+            lines = min(maxLines, entry[0])
+            taken.append((lines, entry[1]))
+            entry[0] -= lines
+            maxLines -= lines
+            self.lines -= lines
+            if (entry[0] == 0):
+                self.entries.popleft()
+        return taken
+
+    def clear(self):
+        self.entries.clear()
+        self.lines = 0
+
+    # GARBAGE_QUEUE_SLOTS (lines, hole) byte pairs, unused ones being 0
+    def toBytes(self):
+        packed = bytearray(GARBAGE_QUEUE_SLOTS * 2)
+        for index, (lines, hole) in enumerate(self.entries):
+            packed[index * 2] = min(lines, 0xff)
+            packed[index * 2 + 1] = hole
+        return packed
+
+    def fromBytes(self, packed):
+        self.clear()
+        for index in range(0, GARBAGE_QUEUE_SLOTS):
+            lines = packed[index * 2]
+            if (lines > 0):
+                self.entries.append([lines, packed[index * 2 + 1]])
+                self.lines += lines
@@ -0,0 +1,151 @@
+from game_manager import *
+import time
+
+# Seconds a direction has to be held before it starts repeating (DAS), and between repeats (ARR)
+# An ARR of 0 moves all the way to the wall as soon as DAS runs out
+DEFAULT_DAS: Final = 0.167
+DEFAULT_ARR: Final = 0.033
+
+# Soft drop repeats this many times faster than gravity. float("inf") drops straight to the floor
+DEFAULT_SOFT_DROP_FACTOR: Final = 20
+
+# Seconds per row of gravity, the GameWindow's tick interval
+DEFAULT_GRAVITY_INTERVAL: Final = 1.0
+
+# Most repeats of one action in a single update, so a stalled frame doesn't turn into a burst
+MAX_REPEATS: Final = max(BOARD_WIDTH, BOARD_HEIGHT)
+
+SHIFT_ACTIONS: Final = (Action.LEFT, Action.RIGHT)
+
+class InputEngine(object):
+    # Turns key presses and releases into game actions, applied together once per frame by update()
+    # A press acts once straight away (on the next update). Held left/right repeat after DAS every ARR, the last
+    # one pressed winning while both are held, and held soft drop repeats at gravity times the soft drop factor
+    # Nothing else repeats, so the OS's key repeat doesn't change how the game plays
+    # Every action goes through GameManager.perform, so recorded games get them
+    def __init__(self, gm, das = DEFAULT_DAS, arr = DEFAULT_ARR, softDropFactor = DEFAULT_SOFT_DROP_FACTOR,
+                 gravityInterval = DEFAULT_GRAVITY_INTERVAL):
+        self.gm = gm
+        self.das = das
+        self.arr = arr
+        self.softDropFactor = softDropFactor
+        self.gravityInterval = gravityInterval
+
+        # Time each held action was pressed, and presses and releases not applied yet
+        self.held = {}
+        self.__presses = []
+        self.__releases = set()
+
+        # The direction repeating, since when, and how many repeats it (and soft drop) has done
+        self.__shift = None
+        self.__shiftStart = 0.0
+        self.__shiftRepeats = 0
+        self.__softDropRepeats = 0
+
+        # Game state each repeating action last failed to move in. It isn't tried again until something changes,
+        # so holding against a wall doesn't fill recordings with moves that do nothing
+        self.__blocked = {}
+
+        # Actions applied so far
+        self.actions = 0
+
+    def keyDown(self, action, now = None):
+        if (action == Action.NONE):
+            return
+        if (action in self.held):
+            # Key repeat. Some platforms send a release right before each repeated press, which is taken back here
+            # (a real release and press within one frame counts as holding the key)
+            self.__releases.discard(action)
+            return
+        if (now is None):
+            now = time.monotonic()
+        self.held[action] = now
+        self.__presses.append(action)
+
+    # Releases only take effect on the next update, see keyDown
+    def keyUp(self, action):
+        if (action in self.held):
+            self.__releases.add(action)
+
+    # Let go of everything, e.g. when the window loses focus
+    def releaseAll(self):
+        self.held.clear()
+        self.__presses.clear()
+        self.__releases.clear()
+        self.__shift = None
+
+    def __perform(self, action):
+        self.gm.perform(action)
+        self.actions += 1
+
+    def __gameState(self):
+        mino = self.gm.currentMino
+        return (self.gm.pieces.position, mino.absCoords, mino.currentState, self.gm.board.hash)
+
+    # Repeat an action count times, or until it stops moving the current tetromino
+    def __repeat(self, action, count):
+        if (self.__blocked.get(action) == self.__gameState()):
+            return
+        mino = self.gm.currentMino
+        for i in range(0, count):
+            coords = mino.absCoords
+            self.__perform(action)
+            if (mino.absCoords == coords):
+                self.__blocked[action] = self.__gameState()
+                return
+
+    # Keep repeating a held action pressed at start, once delay has passed, every interval
+    # An interval of 0 repeats it as far as it goes on every update. Returns the repeats done so far
+    def __autoRepeat(self, action, start, delay, interval, done, now):
+        if (now < start + delay):
+            return done
+        if (interval <= 0):
+            self.__repeat(action, MAX_REPEATS)
+            return done
+        due = int((now - start - delay) / interval) + 1
+        if (due > done):
+            self.__repeat(action, min(due - done, MAX_REPEATS))
+        return due
+
+    # Apply everything since the last update. Returns the number of actions applied
+    def update(self, now = None):
+        if (now is None):
+            now = time.monotonic()
+        applied = self.actions
+
+        # Presses first, in the order they came in
+        for action in self.__presses:
+            self.__perform(action)
+            if (action in SHIFT_ACTIONS):
+                self.__shift = action
+                self.__shiftStart = self.held[action]
+                self.__shiftRepeats = 0
+            elif (action == Action.SOFT_DROP):
+                self.__softDropRepeats = 0
+        self.__presses.clear()
+
+        for action in self.__releases:
+            del self.held[action]
+            if (action == self.__shift):
+                # The other direction takes over if it's still held, charging DAS from now
+                self.__shift = None
+                for other in SHIFT_ACTIONS:
+                    if (other in self.held):
+                        self.__shift = other
+                        self.__shiftStart = now
+                        self.__shiftRepeats = 0
+        self.__releases.clear()
+
+        if (self.__shift is not None):
+            self.__shiftRepeats = self.__autoRepeat(
+                self.__shift, self.__shiftStart, self.das, self.arr, self.__shiftRepeats, now
+            )
+
+        # The press already dropped once, so the first repeat is an interval after it
+        if (Action.SOFT_DROP in self.held):
+            interval = self.gravityInterval / self.softDropFactor
+            self.__softDropRepeats = self.__autoRepeat(
+                Action.SOFT_DROP, self.held[Action.SOFT_DROP], interval, interval, self.__softDropRepeats, now
+            )
+
+        return self.actions - applied
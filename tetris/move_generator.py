@@ -0,0 +1,367 @@
+from game_manager import *
+import struct
+
+# Extra columns on each side of a padded row, enough for any block's column offset
+ROW_PADDING: Final = 3
+
+# Bits for the walls on both sides of a padded row
+PADDED_WALLS: Final = ((1 << (BOARD_WIDTH + 2 * ROW_PADDING)) - 1) ^ (FULL_ROW << ROW_PADDING)
+
+class Placement(object):
+    # A resting position a tetromino can reach, and the inputs that get it there
+    # The path ends with Action.HARD_DROP, which locks the tetromino where it rests
+    # Placements from generatePlacements only look for their path the first time it's asked for, see _PathSearch
+    __slots__ = ("shapeId", "state", "absCoords", "__path", "__spun", "__search")
+
+    def __init__(self, shapeId, state, absCoords, path = None, spun = None, search = None):
+        self.shapeId = shapeId
+        self.state = state
+        self.absCoords = absCoords
+        self.__path = path
+        self.__spun = spun
+        self.__search = search
+
+    @property
+    def path(self):
+        if (self.__path is None):
+            row, col = self.absCoords
+            self.__path = self.__search.pathTo(self.state, row, col)
+            self.__search = None
+        return self.__path
+
+    # Whether the tetromino turned into where it rests as its last move
+    @property
+    def spun(self):
+        if (self.__spun is None):
+            path = self.path
+            self.__spun = len(path) > 1 and path[-2] in ROTATION_ACTIONS
+        return self.__spun
+
+    def getCoords(self):
+        absRow, absCol = self.absCoords
+        return [(absRow + relRow, absCol + relCol) for relRow, relCol in STATE_CELLS[self.shapeId][self.state]]
+
+# For every state and row, a bitmask of the columns the tetromino fits at, indexed [state][row]
+def _fitMasks(board, shapeId):
+    padded = [(rowBits << ROW_PADDING) | PADDED_WALLS for rowBits in board.rows]
+    fitMasks = []
+    for cells in STATE_CELLS[shapeId]:
+        stateFits = [0] * BOARD_HEIGHT
+        for row in range(0, BOARD_HEIGHT):
+            blocked = 0
+            for relRow, relCol in cells:
+                checkRow = row + relRow
+                if (checkRow < 0 or checkRow >= BOARD_HEIGHT):
+                    blocked = FULL_ROW
+                    break
+                # Bit n ends up set if the block would land on something with the tetromino at column n
+                blocked |= padded[checkRow] >> (relCol + ROW_PADDING)
+            stateFits[row] = ~blocked & FULL_ROW
+        fitMasks.append(stateFits)
+    return fitMasks
+
+# Kick tests of each rotation as (desiredState, action, [(rowOffset, colOffset), ...]), indexed [shapeId][currentState]
+def _buildRotationMoves():
+    rotationMoves = []
+    for shapeId in range(0, len(STATE_CELLS)):
+        stateMoves = []
+        for state in range(0, 4):
+            moves = []
+            for direction, action in ((1, Action.CW), (-1, Action.CCW), (2, Action.REVERSE)):
+                desiredState = rotatedState(state, direction)
+                tests = tuple((rowOffset, colOffset) for rowOffset, colOffset, cells in ROTATIONS[shapeId][state][desiredState])
+                moves.append((desiredState, action, tests))
+            stateMoves.append(tuple(moves))
+        rotationMoves.append(tuple(stateMoves))
+    return tuple(rotationMoves)
+
+ROTATION_MOVES: Final = _buildRotationMoves()
+
+ROTATION_ACTIONS: Final = (Action.CW, Action.CCW, Action.REVERSE)
+
+# A search state packs (state, row, col) into one int: state << 9 | row << 4 | col
+ROW_SHIFT: Final = 4
+STATE_SHIFT: Final = 9
+SEARCH_SPACE: Final = 4 << STATE_SHIFT
+BIT_MASK: Final = (1 << STATE_SHIFT) - 1
+
+# generatePlacements works on whole boards at once, every row in one int of LANE_WIDTH bits a row: bit
+# row * LANE_WIDTH + col is (row, col), the same as in a search state. The BOARD_WIDTH + 2 * ROW_PADDING bits of a
+# padded row fit, and the bits past the last column keep shifts from running into the next row
+LANE_WIDTH: Final = 1 << ROW_SHIFT
+LANE_FORMAT: Final = struct.Struct("<%dH" % BOARD_HEIGHT)
+
+# Every column of every row
+BOARD_LANES: Final = sum(FULL_ROW << (row * LANE_WIDTH) for row in range(0, BOARD_HEIGHT))
+
+# Everything in the way of a block besides the board's blocks: the bits past the last column of every row, and
+# ROW_PADDING full rows above and below the board (so the board's rows start ROW_PADDING rows down)
+BOUNDS_LANES: Final = (((1 << ((BOARD_HEIGHT + 2 * ROW_PADDING) * LANE_WIDTH)) - 1)
+                       ^ (BOARD_LANES << (ROW_PADDING * LANE_WIDTH)))
+
+# ROTATION_MOVES with each kick test's rowOffset and colOffset as one bit offset in the lanes
+ROTATION_OFFSETS: Final = tuple(
+    tuple(
+        tuple((desiredState, action, tuple(rowOffset * LANE_WIDTH + colOffset for rowOffset, colOffset in tests))
+              for desiredState, action, tests in stateMoves)
+        for stateMoves in shapeMoves
+    )
+    for shapeMoves in ROTATION_MOVES
+)
+
+# Bit offsets of each state of each tetromino's blocks into the bounded lanes, indexed [shapeId][state]
+CELL_OFFSETS: Final = tuple(
+    tuple(tuple((relRow + ROW_PADDING) * LANE_WIDTH + relCol for relRow, relCol in cells) for cells in states)
+    for states in STATE_CELLS
+)
+
+# For each state of each tetromino, the other states covering the same blocks from elsewhere, e.g. all of O's
+# As (otherState, bit offset), indexed [shapeId][state]: the state at a bit covers what otherState covers at
+# that bit plus the offset
+def _buildSameFootprints():
+    sameFootprints = []
+    for states in STATE_CELLS:
+        stateSames = []
+        for state, cells in enumerate(states):
+            sames = []
+            for otherState, otherCells in enumerate(states):
+                rowOffset = min(cells)[0] - min(otherCells)[0]
+                colOffset = min(cells)[1] - min(otherCells)[1]
+                if (otherState != state and
+                    set((relRow + rowOffset, relCol + colOffset) for relRow, relCol in otherCells) == set(cells)):
+                    sames.append((otherState, rowOffset * LANE_WIDTH + colOffset))
+            stateSames.append(tuple(sames))
+        sameFootprints.append(tuple(stateSames))
+    return tuple(sameFootprints)
+
+SAME_FOOTPRINTS: Final = _buildSameFootprints()
+
+def _shiftLanes(lanes, offset):
+    return lanes << offset if offset >= 0 else lanes >> -offset
+
+# For every state, the lanes of where the tetromino fits, indexed [state]
+def _fitLanes(board, shapeId):
+    blocked = int.from_bytes(LANE_FORMAT.pack(*board.rows), "little") << (ROW_PADDING * LANE_WIDTH) | BOUNDS_LANES
+    fitLanes = []
+    for offsets in CELL_OFFSETS[shapeId]:
+        stateBlocked = 0
+        for offset in offsets:
+            # A bit ends up set if the block would land on something with the tetromino there
+            stateBlocked |= blocked >> offset
+        fitLanes.append(~stateBlocked & BOARD_LANES)
+    return fitLanes
+
+# Masks for spreading over a state's fits, Kogge-Stone style: each step doubles how far reached bits go, onto
+# bits with that many fits in a row leading up to them. Left steps go 2, 4 and 8 columns, down steps 2, 4, 8
+# and 16 rows (single steps just use the fits)
+def _spreadMasks(fits):
+    left2 = fits & (fits >> 1)
+    left4 = left2 & (left2 >> 2)
+    left8 = left4 & (left4 >> 4)
+    down2 = fits & (fits << LANE_WIDTH)
+    down4 = down2 & (down2 << (2 * LANE_WIDTH))
+    down8 = down4 & (down4 << (4 * LANE_WIDTH))
+    down16 = down8 & (down8 << (8 * LANE_WIDTH))
+    return (left2, left4, left8, down2, down4, down8, down16)
+
+# Everything reached from the given lanes by moving and soft dropping, each step only onto fits
+# Sideways and down take turns until one of them adds nothing, as the other already went as far as it could
+def _spread(reached, fits, spreadMasks):
+    left2, left4, left8, down2, down4, down8, down16 = spreadMasks
+    spread = reached
+    dropped = False
+    while (True):
+        # Right, by carrying through each run of fits the reached bits are in
+        reached = (((fits + spread) ^ fits) | spread) & fits
+        reached |= fits & (reached >> 1)
+        reached |= left2 & (reached >> 2)
+        reached |= left4 & (reached >> 4)
+        reached |= left8 & (reached >> 8)
+        if (dropped and reached == spread):
+            return reached
+        dropped = True
+
+        spread = reached | (fits & (reached << LANE_WIDTH))
+        spread |= down2 & (spread << (2 * LANE_WIDTH))
+        spread |= down4 & (spread << (4 * LANE_WIDTH))
+        spread |= down8 & (spread << (8 * LANE_WIDTH))
+        spread |= down16 & (spread << (16 * LANE_WIDTH))
+        if (spread == reached):
+            return reached
+
+# For every state, the lanes of where the tetromino can get to from the given state and bit, indexed [state]
+# Each state spreads as far as it goes, then what it newly reached rotates into the other states, until
+# nothing new is reached
+def _floodFill(fitLanes, rotationOffsets, state, start):
+    reach = [0] * 4
+    rotated = [0] * 4
+    spreadMasks = [None] * 4
+    reach[state] = start
+    pending = [state]
+    while (len(pending) > 0):
+        state = pending.pop()
+        if (spreadMasks[state] is None):
+            spreadMasks[state] = _spreadMasks(fitLanes[state])
+        reach[state] = _spread(reach[state], fitLanes[state], spreadMasks[state])
+        fresh = reach[state] & ~rotated[state]
+        rotated[state] = reach[state]
+
+        # The first kick test that fits wins, like GameManager.__rotate, so each test only gets what no
+        # earlier test took
+        for desiredState, action, offsets in rotationOffsets[state]:
+            desiredFits = fitLanes[desiredState]
+            remaining = fresh
+            for offset in offsets:
+                if (offset >= 0):
+                    passed = (desiredFits >> offset) & remaining
+                    moved = passed << offset
+                else:
+                    passed = (desiredFits << -offset) & remaining
+                    moved = passed >> -offset
+                if (passed):
+                    if (moved & ~reach[desiredState]):
+                        reach[desiredState] |= moved
+                        if (desiredState not in pending):
+                            pending.append(desiredState)
+                    remaining &= ~passed
+                    if (remaining == 0):
+                        break
+
+    return reach
+
+# Every resting placement the tetromino can reach from the given state and coordinates, using moves,
+# soft drops and rotations (kicks included)
+# Placements covering the same blocks are only returned once, in the state the fewest turns from the start
+def generatePlacements(board, shapeId, state = 0, absCoords = STARTING_COORDS):
+    fitLanes = _fitLanes(board, shapeId)
+    startRow, startCol = absCoords
+    start = 1 << (startRow * LANE_WIDTH + startCol)
+    if (not fitLanes[state] & start):
+        return []
+    reach = _floodFill(fitLanes, ROTATION_OFFSETS[shapeId], state, start)
+    search = _PathSearch(fitLanes, ROTATION_OFFSETS[shapeId], state, startRow, startCol)
+
+    placements = []
+    resting = [None] * 4
+    for turns in (0, 1, 3, 2):
+        restState = (state + turns) % 4
+        # Resting means there's nothing to soft drop into
+        stateResting = reach[restState] & ~(fitLanes[restState] >> LANE_WIDTH)
+        for otherState, offset in SAME_FOOTPRINTS[shapeId][restState]:
+            if (resting[otherState] is not None):
+                stateResting &= ~_shiftLanes(resting[otherState], -offset)
+        resting[restState] = stateResting
+
+        while (stateResting):
+            bit = (stateResting & -stateResting).bit_length() - 1
+            row, col = divmod(bit, LANE_WIDTH)
+            placements.append(Placement(shapeId, restState, (row, col), None, None, search))
+            stateResting &= stateResting - 1
+
+    return placements
+
+class _PathSearch(object):
+    # Breadth first search over the same moves as _floodFill, so the first path found to a state is a shortest one
+    # The placements from one generatePlacements call share it, and it only searches as far as the paths asked for
+    def __init__(self, fitLanes, rotationOffsets, state, row, col):
+        self.fitLanes = fitLanes
+        self.rotationOffsets = rotationOffsets
+        self.start = (state << STATE_SHIFT) | (row << ROW_SHIFT) | col
+        self.queue = None
+
+    def pathTo(self, state, row, col):
+        if (self.queue is None):
+            # Each visited state remembers the state and action it was reached from
+            self.parents = [None] * SEARCH_SPACE
+            self.actions = [None] * SEARCH_SPACE
+            self.visited = bytearray(SEARCH_SPACE)
+            self.visited[self.start] = 1
+            self.queue = [self.start]
+            self.next = 0
+
+        target = (state << STATE_SHIFT) | (row << ROW_SHIFT) | col
+        while (not self.visited[target] and self.next < len(self.queue)):
+            self.__expand(self.queue[self.next])
+            self.next += 1
+
+        path = [Action.HARD_DROP]
+        step = target
+        while (step != self.start):
+            path.append(self.actions[step])
+            step = self.parents[step]
+        path.reverse()
+        return path
+
+    def __visit(self, key, parent, action):
+        if (not self.visited[key]):
+            self.visited[key] = 1
+            self.parents[key] = parent
+            self.actions[key] = action
+            self.queue.append(key)
+
+    def __expand(self, key):
+        state = key >> STATE_SHIFT
+        bit = key & BIT_MASK
+        fits = self.fitLanes[state]
+
+        # Off the board, fits has nothing, and the bits past each row's last column keep moves in their row
+        if (bit > 0 and (fits >> (bit - 1)) & 1):
+            self.__visit(key - 1, key, Action.LEFT)
+        if ((fits >> (bit + 1)) & 1):
+            self.__visit(key + 1, key, Action.RIGHT)
+        if ((fits >> (bit + LANE_WIDTH)) & 1):
+            self.__visit(key + LANE_WIDTH, key, Action.SOFT_DROP)
+
+        for desiredState, action, offsets in self.rotationOffsets[state]:
+            desiredFits = self.fitLanes[desiredState]
+            for offset in offsets:
+                checkBit = bit + offset
+                if (checkBit >= 0 and (desiredFits >> checkBit) & 1):
+                    self.__visit((desiredState << STATE_SHIFT) | checkBit, key, action)
+                    break
+
+# A cheaper subset of generatePlacements: rotate at the spawn position, shift left or right, then hard drop
+# Good enough for looking ahead, where tucks and spins rarely matter
+def generateDropPlacements(board, shapeId, state = 0, absCoords = STARTING_COORDS):
+    fitMasks = _fitMasks(board, shapeId)
+    startRow, startCol = absCoords
+    if (not (fitMasks[state][startRow] >> startCol) & 1):
+        return []
+
+    # Where each rotation (or none) leaves the tetromino at the spawn position
+    starts = [([], state, startRow, startCol)]
+    for desiredState, action, tests in ROTATION_MOVES[shapeId][state]:
+        for rowOffset, colOffset in tests:
+            checkRow = startRow + rowOffset
+            checkCol = startCol + colOffset
+            if (0 <= checkRow < BOARD_HEIGHT and checkCol >= 0 and (fitMasks[desiredState][checkRow] >> checkCol) & 1):
+                starts.append(([action], desiredState, checkRow, checkCol))
+                break
+
+    placements = []
+    footprints = set()
+    for prefix, state, row, col in starts:
+        stateFits = fitMasks[state]
+        for action, step in ((Action.LEFT, -1), (Action.RIGHT, 1)):
+            moves = 0
+            checkCol = col
+            while (checkCol >= 0 and (stateFits[row] >> checkCol) & 1):
+                landingRow = row
+                while (landingRow < BOARD_HEIGHT - 1 and (stateFits[landingRow + 1] >> checkCol) & 1):
+                    landingRow += 1
+
+                footprint = frozenset((landingRow + relRow, checkCol + relCol) for relRow, relCol in STATE_CELLS[shapeId][state])
+                if (footprint not in footprints):
+                    footprints.add(footprint)
+                    path = prefix + [action] * moves + [Action.HARD_DROP]
+                    placements.append(Placement(shapeId, state, (landingRow, checkCol), path, False))
+
+                moves += 1
+                checkCol += step
+
+    return placements
+
+# Placements for a GameManager's current tetromino, from where it is now
+def generateCurrentPlacements(gm):
+    mino = gm.currentMino
+    return generatePlacements(gm.board, mino.shapeId, mino.currentState, mino.absCoords)
@@ -0,0 +1,87 @@
+from typing import Final
+from collections import deque
+from tetrominos import *
+import itertools
+import random
+
+# Tetrominos in every bag
+BAG_SIZE: Final = len(TETROMINO_TYPES)
+
+# Every order a bag can come in
+BAG_ORDERS: Final = tuple(itertools.permutations(Bag))
+
+MASK_64: Final = (1 << 64) - 1
+
+# SplitMix64 constants
+SPLITMIX_GAMMA: Final = 0x9e3779b97f4a7c15
+SPLITMIX_MUL1: Final = 0xbf58476d1ce4e5b9
+SPLITMIX_MUL2: Final = 0x94d049bb133111eb
+
+# The index-th output of a SplitMix64 stream started at the seed. Needs no state, so any output can be made directly
+def splitMix(seed, index):
+    z = (seed + (index + 1) * SPLITMIX_GAMMA) & MASK_64
+    z = ((z ^ (z >> 30)) * SPLITMIX_MUL1) & MASK_64
+    z = ((z ^ (z >> 27)) * SPLITMIX_MUL2) & MASK_64
+    return z ^ (z >> 31)
+
+# A game's bag with the given index. Its order is picked by hashing the game's seed and the index,
+# so any bag of a game can be made without making the ones before it
+def createBag(seed, index):
+    return list(BAG_ORDERS[splitMix(seed, index) % len(BAG_ORDERS)])
+
+# Lazy iterator over a game's bags, starting at the given bag
+def bagSequence(seed, start = 0):
+    index = start
+    while (True):
+        yield createBag(seed, index)
+        index += 1
+
+# Seed for a game that wasn't given one. Drawn from the global RNG, so seeding that still repeats games
+def randomSeed():
+    return random.getrandbits(63)
+
+class PieceGenerator(object):
+    # Iterator over a game's tetrominos as Bag values, 7-bag by 7-bag
+    # Upcoming tetrominos are kept in a preview queue at least previewLength long, filled a bag at a time
+    # Any int is a seed, taken mod 2^64 so it's the 64 bits snapshots, recordings and keyframes store
+    def __init__(self, seed = None, previewLength = 5):
+        self.seed = randomSeed() if seed is None else seed & MASK_64
+        self.previewLength = previewLength
+        self.__preview = deque()
+        self.seek(0)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.__fill(self.previewLength + 1)
+        self.position += 1
+        return self.__preview.popleft()
+
+    def __fill(self, count):
+        while (len(self.__preview) < count):
+            self.__preview.extend(next(self.__bags))
+
+    # Upcoming tetrominos, next one first. Defaults to previewLength of them
+    def peek(self, count = None):
+        if (count is None):
+            count = self.previewLength
+        self.__fill(count)
+        return [self.__preview[i] for i in range(0, count)]
+
+    # Jump to the given number of tetrominos drawn, from the start of the game
+    # Only the bag it lands in is made, however far away it is
+    def seek(self, position):
+        self.position = position
+        self.__bags = bagSequence(self.seed, position // BAG_SIZE)
+        self.__preview.clear()
+        self.__preview.extend(next(self.__bags)[position % BAG_SIZE:])
+
+    # Throw away the next count tetrominos
+    def skip(self, count):
+        if (count < len(self.__preview)):
+            for i in range(0, count):
+                self.__preview.popleft()
+            self.position += count
+        else:
+            self.seek(self.position + count)
@@ -0,0 +1,186 @@
+from typing import Final
+import json
+import os
+import threading
+import time
+
+# Each power of 2 of nanoseconds is split into 2^HISTOGRAM_SUB_BITS buckets, so percentiles are within about 6%
+HISTOGRAM_SUB_BITS: Final = 3
+HISTOGRAM_SUB_BUCKETS: Final = 1 << HISTOGRAM_SUB_BITS
+HISTOGRAM_BUCKETS: Final = 64 * HISTOGRAM_SUB_BUCKETS
+
+# GameManager methods timed by instrumentGame. Private ones are timed through their mangled names
+GAME_SPANS: Final = (
+    "moveLeft", "moveRight", "cw", "ccw", "reverse", "softDrop", "hardDrop", "hold", "tick",
+    "_GameManager__checkRowsCompleted", "_GameManager__nextTetromino", "_GameManager__updateBoard"
+)
+
+# Set to a file path to profile GameWindow, with the stats dumped to it every PROFILE_DUMP_INTERVAL seconds
+PROFILE_ENVIRONMENT: Final = "TETRIS_PROFILE"
+PROFILE_DUMP_INTERVAL: Final = 5.0
+
+class LatencyHistogram(object):
+    # Log-linear histogram of durations in nanoseconds. Recording is a couple of integer operations
+    def __init__(self):
+        self.counts = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, ns):
+        if (ns < HISTOGRAM_SUB_BUCKETS):
+            bucket = ns
+        else:
+            shift = ns.bit_length() - HISTOGRAM_SUB_BITS - 1
+            bucket = (shift + 1) * HISTOGRAM_SUB_BUCKETS + (ns >> shift) - HISTOGRAM_SUB_BUCKETS
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += ns
+        if (ns > self.max):
+            self.max = ns
+
+    # Middle of the bucket the given fraction of the recorded durations fall under, in nanoseconds
+    def getPercentile(self, fraction):
+        if (self.count == 0):
+            return 0
+        rank = max(1, int(self.count * fraction + 0.5))
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if (seen >= rank):
+                if (bucket < HISTOGRAM_SUB_BUCKETS):
+                    return bucket
+                shift = bucket // HISTOGRAM_SUB_BUCKETS - 1
+                low = (bucket % HISTOGRAM_SUB_BUCKETS + HISTOGRAM_SUB_BUCKETS) << shift
+                return min(low + (1 << shift) // 2, self.max)
+        return self.max
+
+    def getStats(self):
+        return {
+            "count": self.count,
+            "meanUs": self.total / self.count / 1000 if self.count > 0 else 0.0,
+            "p50Us": self.getPercentile(0.5) / 1000,
+            "p99Us": self.getPercentile(0.99) / 1000,
+            "maxUs": self.max / 1000
+        }
+
+class Profiler(object):
+    # Times spans of work into a histogram each. Instrumenting wraps an object's methods on that object only,
+    # so nothing is wrapped (and nothing costs anything) unless a Profiler is attached
+    # Input to frame latency runs from the first input handled since the last frame to the end of the next frame
+    def __init__(self):
+        self.histograms = {}
+        self.frames = 0
+        self.__pendingInput = None
+        self.__lastFrame = None
+        self.__wrapped = []
+        self.__dumpStop = None
+
+    def getHistogram(self, name):
+        histogram = self.histograms.get(name)
+        if (histogram is None):
+            histogram = LatencyHistogram()
+            self.histograms[name] = histogram
+        return histogram
+
+    def record(self, name, ns):
+        self.getHistogram(name).record(ns)
+
+    # Replace obj.attribute with a timed version, recorded under the given name
+    def wrap(self, obj, attribute, name = None, before = None, after = None):
+        function = getattr(obj, attribute)
+        histogram = self.getHistogram(name if name is not None else attribute.split("__")[-1])
+        clock = time.perf_counter_ns
+
+        def timed(*args, **kwargs):
+            if (before is not None):
+                before()
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                end = clock()
+                histogram.record(end - start)
+                if (after is not None):
+                    after(end)
+
+        setattr(obj, attribute, timed)
+        self.__wrapped.append((obj, attribute))
+
+    # Take every wrapper back off
+    def detach(self):
+        for obj, attribute in self.__wrapped:
+            delattr(obj, attribute)
+        self.__wrapped.clear()
+
+    def instrumentGame(self, gm):
+        for attribute in GAME_SPANS:
+            self.wrap(gm, attribute)
+
+    # Has to run before the window binds its handlers, since Tk keeps the methods it was given
+    def instrumentWindow(self, window):
+        self.wrap(window, "_GameWindow__keyEventListener", "keyEvent", before = self.markInput)
+        self.wrap(window, "_GameWindow__tick", "windowTick")
+        self.wrap(window, "_GameWindow__frame", "frame")
+        self.wrap(window, "_GameWindow__updateWindow", "updateWindow", after = self.markFrame)
+
+    # An input arrived. Only the first since the last frame counts, it's the one that waited longest
+    def markInput(self):
+        if (self.__pendingInput is None):
+            self.__pendingInput = time.perf_counter_ns()
+
+    # A frame finished rendering at the given time
+    def markFrame(self, now = None):
+        if (now is None):
+            now = time.perf_counter_ns()
+        self.frames += 1
+        if (self.__lastFrame is not None):
+            self.record("frameInterval", now - self.__lastFrame)
+        self.__lastFrame = now
+        if (self.__pendingInput is not None):
+            self.record("inputToFrame", now - self.__pendingInput)
+            self.__pendingInput = None
+
+    def getStats(self):
+        stats = {"frames": self.frames, "spans": {}}
+        for name, histogram in list(self.histograms.items()):
+            stats["spans"][name] = histogram.getStats()
+        return stats
+
+    def reset(self):
+        self.histograms.clear()
+        self.frames = 0
+        self.__pendingInput = None
+        self.__lastFrame = None
+
+    def dump(self, path):
+        # Written to a temporary file first, so readers never see half of a dump
+        stats = self.getStats()
+        stats["time"] = time.time()
+        with open(path + ".tmp", "w") as file:
+            json.dump(stats, file, indent = 2)
+        os.replace(path + ".tmp", path)
+
+    # Dump the stats to a file every interval seconds from a background thread
+    def startDump(self, path, interval = PROFILE_DUMP_INTERVAL):
+        self.stopDump()
+        stop = threading.Event()
+        def dumpLoop():
+            while (not stop.wait(interval)):
+                self.dump(path)
+        self.__dumpStop = stop
+        threading.Thread(target = dumpLoop, daemon = True).start()
+
+    def stopDump(self):
+        if (self.__dumpStop is not None):
+            self.__dumpStop.set()
+            self.__dumpStop = None
+
+# A Profiler dumping to the file named by the TETRIS_PROFILE environment variable, or None if it isn't set
+def profilerFromEnvironment():
+    path = os.environ.get(PROFILE_ENVIRONMENT)
+    if (not path):
+        return None
+    profiler = Profiler()
+    profiler.startDump(path)
+    return profiler
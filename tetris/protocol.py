@@ -0,0 +1,198 @@
+from game_manager import *
+import struct
+
+# A message is a keyframe with a game's whole state, or a delta with what changed since the last tick's message
+# Board rows are sent as their colors, 2 palette indices per byte
+KEYFRAME: Final = 1
+DELTA: Final = 2
+
+ROW_BYTES: Final = (BOARD_WIDTH + 1) // 2
+
+# Keyframe: type, frame, seed, tetrominos drawn, piece (shapeId, state, row, col), held shapeId, game over, then every row
+KEYFRAME_HEADER: Final = struct.Struct("!BIQQBBbbBB")
+
+# Delta: type, frame, flags, then each flagged part in flag order. Changed rows are a bitmask of row indices
+# followed by the colors of each of those rows, top first
+DELTA_HEADER: Final = struct.Struct("!BIB")
+DELTA_ROWS: Final = 1
+DELTA_PIECE: Final = 2
+DELTA_POSITION: Final = 4
+DELTA_HOLD: Final = 8
+DELTA_GAME_OVER: Final = 16
+
+ROW_MASK_FORMAT: Final = struct.Struct("!I")
+PIECE_STATE_FORMAT: Final = struct.Struct("!BBbb")
+POSITION_FORMAT: Final = struct.Struct("!Q")
+
+def packRow(cells, row):
+    start = row * BOARD_WIDTH
+    packed = bytearray(ROW_BYTES)
+    for col in range(0, BOARD_WIDTH):
+        packed[col >> 1] |= cells[start + col] << ((col & 1) * 4)
+    return packed
+
+def unpackRow(packed, offset, cells, row):
+    start = row * BOARD_WIDTH
+    for col in range(0, BOARD_WIDTH):
+        cells[start + col] = (packed[offset + (col >> 1)] >> ((col & 1) * 4)) & 0x0f
+
+def _pieceState(gm):
+    mino = gm.currentMino
+    row, col = mino.absCoords
+    return (mino.shapeId, mino.currentState, row, col)
+
+class StateEncoder(object):
+    # Encodes a GameManager's state for the clients watching it. encodeTick is called once per tick and its
+    # message is shared by every client that got the previous one. Clients joining (or that missed a message)
+    # get a keyframe instead
+    def __init__(self, gm):
+        self.gm = gm
+        self.__cells = None
+        self.__piece = None
+        self.__position = None
+        self.__hold = None
+        self.__gameOver = None
+
+    def encodeKeyframe(self):
+        gm = self.gm
+        message = bytearray(KEYFRAME_HEADER.pack(
+            KEYFRAME, gm.frame, gm.pieces.seed, gm.pieces.position, *_pieceState(gm), HELD_NONE, gm.gameOver
+        ))
+        for row in range(0, BOARD_HEIGHT):
+            message += packRow(gm.board.cells, row)
+        return bytes(message)
+
+    # What changed since the last call, or None if nothing did
+    def encodeTick(self):
+        gm = self.gm
+        cells = gm.board.cells
+        flags = 0
+        parts = []
+
+        if (self.__cells is None or self.__cells != cells):
+            rowMask = 0
+            rows = bytearray()
+            for row in range(0, BOARD_HEIGHT):
+                start = row * BOARD_WIDTH
+                if (self.__cells is None or self.__cells[start:start + BOARD_WIDTH] != cells[start:start + BOARD_WIDTH]):
+                    rowMask |= 1 << row
+                    rows += packRow(cells, row)
+            self.__cells = bytes(cells)
+            flags |= DELTA_ROWS
+            parts.append(ROW_MASK_FORMAT.pack(rowMask))
+            parts.append(rows)
+
+        piece = _pieceState(gm)
+        if (piece != self.__piece):
+            self.__piece = piece
+            flags |= DELTA_PIECE
+            parts.append(PIECE_STATE_FORMAT.pack(*piece))
+
+        if (gm.pieces.position != self.__position):
+            self.__position = gm.pieces.position
+            flags |= DELTA_POSITION
+            parts.append(POSITION_FORMAT.pack(self.__position))
+
+        if (HELD_NONE != self.__hold):
+            self.__hold = HELD_NONE # Hold isn't implemented yet
+            flags |= DELTA_HOLD
+            parts.append(bytes((HELD_NONE,)))
+
+        if (gm.gameOver != self.__gameOver):
+            self.__gameOver = gm.gameOver
+            if (gm.gameOver):
+                flags |= DELTA_GAME_OVER
+
+        if (flags == 0):
+            return None
+        return DELTA_HEADER.pack(DELTA, gm.frame, flags) + b"".join(parts)
+
+class StateDecoder(object):
+    # A client's copy of a game, kept up to date from encoded messages
+    # It has GameManager's getBlockColor and getPreview, so a GameCanvas can draw it like a local game
+    def __init__(self):
+        self.synced = False
+        # Tick of the last message that changed something
+        self.frame = 0
+        self.seed = None
+        self.pieces = None
+        self.cells = bytearray(BOARD_WIDTH * BOARD_HEIGHT)
+        self.piece = None
+        self.pieceCoords = []
+        self.held = HELD_NONE
+        self.gameOver = False
+
+    # Apply a message. Returns the (row, col) of every block that may look different now
+    # Deltas are ignored until a keyframe arrives
+    def apply(self, message):
+        messageType = message[0]
+        if (messageType == KEYFRAME):
+            fields = KEYFRAME_HEADER.unpack_from(message)
+            self.frame, seed, position = fields[1:4]
+            if (seed != self.seed):
+                self.seed = seed
+                self.pieces = PieceGenerator(seed)
+            self.pieces.seek(position)
+            self.held = fields[8]
+            self.gameOver = fields[9]
+            offset = KEYFRAME_HEADER.size
+            for row in range(0, BOARD_HEIGHT):
+                unpackRow(message, offset, self.cells, row)
+                offset += ROW_BYTES
+            self.__setPiece(fields[4:8])
+            self.synced = True
+            return set(ALL_CELLS)
+
+        if (messageType != DELTA or not self.synced):
+            return set()
+
+        changed = set()
+        ignored, self.frame, flags = DELTA_HEADER.unpack_from(message)
+        offset = DELTA_HEADER.size
+        if (flags & DELTA_ROWS):
+            rowMask, = ROW_MASK_FORMAT.unpack_from(message, offset)
+            offset += ROW_MASK_FORMAT.size
+            for row in range(0, BOARD_HEIGHT):
+                if ((rowMask >> row) & 1):
+                    unpackRow(message, offset, self.cells, row)
+                    offset += ROW_BYTES
+                    changed.update((row, col) for col in range(0, BOARD_WIDTH))
+        if (flags & DELTA_PIECE):
+            changed.update(self.pieceCoords)
+            self.__setPiece(PIECE_STATE_FORMAT.unpack_from(message, offset))
+            changed.update(self.pieceCoords)
+            offset += PIECE_STATE_FORMAT.size
+        if (flags & DELTA_POSITION):
+            position, = POSITION_FORMAT.unpack_from(message, offset)
+            if (position >= self.pieces.position):
+                self.pieces.skip(position - self.pieces.position)
+            else:
+                self.pieces.seek(position)
+            offset += POSITION_FORMAT.size
+        if (flags & DELTA_HOLD):
+            self.held = message[offset]
+            offset += 1
+        # Only sent when the game ends, so it holds until the next keyframe
+        if (flags & DELTA_GAME_OVER):
+            self.gameOver = True
+        return changed
+
+    def __setPiece(self, piece):
+        shapeId, state, row, col = piece
+        self.piece = (shapeId, state, row, col)
+        self.pieceCoords = [(row + relRow, col + relCol) for relRow, relCol in STATE_CELLS[shapeId][state]]
+
+    def getBlockColor(self, row, col):
+        if (self.piece is not None and (row, col) in self.pieceCoords):
+            return PALETTE[self.piece[0] + 1]
+        colorId = self.cells[row * BOARD_WIDTH + col]
+        if (colorId != 0):
+            return PALETTE[colorId]
+        elif (row < MARGIN_HEIGHT):
+            return MARGIN_COLOR
+        return BASE_COLOR
+
+    def getPreview(self, count = 5):
+        if (self.pieces is None):
+            return []
+        return self.pieces.peek(count)
@@ -0,0 +1,87 @@
+from typing import Final
+import struct
+
+# A recording is a header, one event per input, and a footer:
+#   header: magic, the game's seed
+#   event:  1 byte with the input's code in the high nibble and the frames since the previous event in the low one.
+#           Deltas that don't fit are FRAME_ESCAPE followed by the delta as a varint. Test block events are followed
+#           by a byte, the block's row * BOARD_WIDTH + col, and garbage events by lines * BOARD_WIDTH + hole column
+#   footer: an END_CODE event at the last frame, then the Zobrist hash the game ended with
+REPLAY_MAGIC: Final = b"TRP1"
+REPLAY_HEADER: Final = struct.Struct("<4sQ")
+REPLAY_FOOTER: Final = struct.Struct("<Q")
+
+FRAME_ESCAPE: Final = 15
+
+# Codes 1 to 8 are Action values
+END_CODE: Final = 0
+CREATE_TEST_BLOCK_CODE: Final = 9
+DESTROY_TEST_BLOCK_CODE: Final = 10
+GARBAGE_CODE: Final = 11
+
+class ReplayRecorder(object):
+    # Builds a recording as inputs come in
+    def __init__(self, seed):
+        self.seed = seed
+        self.data = bytearray(REPLAY_HEADER.pack(REPLAY_MAGIC, seed))
+        self.events = 0
+        self.__lastFrame = 0
+
+    def record(self, frame, code, arg = None):
+        self.data += _encodeEvent(frame - self.__lastFrame, code)
+        if (arg is not None):
+            self.data.append(arg)
+        self.__lastFrame = frame
+        self.events += 1
+
+    # The finished recording. Recording can carry on afterwards
+    def finish(self, frame, finalHash):
+        return bytes(self.data) + _encodeEvent(frame - self.__lastFrame, END_CODE) + REPLAY_FOOTER.pack(finalHash)
+
+def _encodeEvent(delta, code):
+    if (delta < FRAME_ESCAPE):
+        return bytes(((code << 4) | delta,))
+
+    encoded = bytearray(((code << 4) | FRAME_ESCAPE,))
+    while (delta >= 0x80):
+        encoded.append((delta & 0x7f) | 0x80)
+        delta >>= 7
+    encoded.append(delta)
+    return encoded
+
+# (seed, [(frame, code, arg), ...], last frame, final hash) of a recording. arg is None for everything but test blocks and garbage
+def decodeReplay(data):
+    magic, seed = REPLAY_HEADER.unpack_from(data, 0)
+    if (magic != REPLAY_MAGIC):
+        raise ValueError("Not a replay")
+
+    events = []
+    frame = 0
+    pos = REPLAY_HEADER.size
+    while (True):
+        byte = data[pos]
+        pos += 1
+        code = byte >> 4
+        delta = byte & 0x0f
+        if (delta == FRAME_ESCAPE):
+            delta = 0
+            shift = 0
+            while (True):
+                byte = data[pos]
+                pos += 1
+                delta |= (byte & 0x7f) << shift
+                shift += 7
+                if (byte < 0x80):
+                    break
+        frame += delta
+
+        if (code == END_CODE):
+            break
+        arg = None
+        if (code >= CREATE_TEST_BLOCK_CODE):
+            arg = data[pos]
+            pos += 1
+        events.append((frame, code, arg))
+
+    finalHash, = REPLAY_FOOTER.unpack_from(data, pos)
+    return seed, events, frame, finalHash
@@ -0,0 +1,67 @@
+from game_manager import *
+
+# Frames between the snapshots kept while replaying, which seeking starts from
+KEYFRAME_INTERVAL: Final = 256
+
+class ReplayEngine(object):
+    # Re-simulates a recording on a headless GameManager as fast as it can
+    # A keyframe snapshot is kept every keyframeInterval frames on the way, so seeking back only replays
+    # the frames since the closest one
+    def __init__(self, data, keyframeInterval = KEYFRAME_INTERVAL):
+        self.seed, self.events, self.lastFrame, self.finalHash = decodeReplay(data)
+        self.keyframeInterval = keyframeInterval
+        self.gm = GameManager(self.seed)
+        self.__nextEvent = 0
+
+        # Snapshot and next event of every keyframe reached so far, by frame
+        self.__keyframes = {}
+
+    # Play the whole recording. Returns the game as it ended
+    def run(self):
+        self.seek(self.lastFrame)
+        return self.gm
+
+    # Whether replaying ends the game exactly as it was recorded
+    def verify(self):
+        return self.run().getHash() == self.finalHash
+
+    # Bring the game to the given frame, with every input of that frame applied
+    def seek(self, frame):
+        frame = min(frame, self.lastFrame)
+
+        # Start from the closest keyframe before the frame, unless the game is already between the two
+        keyframe = frame - frame % self.keyframeInterval
+        while (keyframe > 0 and keyframe not in self.__keyframes):
+            keyframe -= self.keyframeInterval
+        if (keyframe in self.__keyframes and (frame < self.gm.frame or keyframe > self.gm.frame)):
+            snapshot, self.__nextEvent = self.__keyframes[keyframe]
+            self.gm.restore(snapshot)
+
+        self.__advance(frame)
+        return self.gm
+
+    def __advance(self, frame):
+        gm = self.gm
+        events = self.events
+        eventCount = len(events)
+        nextEvent = self.__nextEvent
+        while (True):
+            # Apply every input of the current frame
+            while (nextEvent < eventCount and events[nextEvent][0] == gm.frame):
+                eventFrame, code, arg = events[nextEvent]
+                if (code == CREATE_TEST_BLOCK_CODE):
+                    gm.createTestBlock(arg // BOARD_WIDTH, arg % BOARD_WIDTH)
+                elif (code == DESTROY_TEST_BLOCK_CODE):
+                    gm.destroyTestBlock(arg // BOARD_WIDTH, arg % BOARD_WIDTH)
+                elif (code == GARBAGE_CODE):
+                    gm.receiveGarbage(arg // BOARD_WIDTH, arg % BOARD_WIDTH)
+                else:
+                    gm.perform(Action(code))
+                nextEvent += 1
+
+            if (gm.frame % self.keyframeInterval == 0 and gm.frame not in self.__keyframes):
+                self.__keyframes[gm.frame] = (gm.snapshot(), nextEvent)
+            if (gm.frame >= frame):
+                break
+            gm.tick()
+        self.__nextEvent = nextEvent
@@ -1,19 +1,36 @@
 import tkinter as tk
 from game_manager import *
+from audio import *
 from timer import *
+from input_engine import *
+from profiling import *
 from typing import Final
 
+# Seconds between frames. Inputs are applied and the window redrawn once per frame
+FRAME_INTERVAL: Final = 1 / 60
+
 # In pixels
 CANVAS_WIDTH: Final  = BLOCK_SIZE * BOARD_WIDTH
 CANVAS_HEIGHT: Final = BLOCK_SIZE * BOARD_HEIGHT
 
-class BlockLabel(tk.Label):
-    def __init__(self, *args, **kwargs):
-        super(BlockLabel, self).__init__(*args, **kwargs)
-        self.absCoords = (-1, -1)
+# Action of each key. Inputs go through GameManager.perform, so recorded games get them
+KEY_ACTIONS: Final = {
+    "Up": Action.CW,
+    "x": Action.CW,
+    "z": Action.CCW,
+    "Control_L": Action.CCW,
+    "a": Action.REVERSE,
+    "Down": Action.SOFT_DROP,
+    "Left": Action.LEFT,
+    "Right": Action.RIGHT,
+    "c": Action.HOLD,
+    "Shift_L": Action.HOLD,
+    "space": Action.HARD_DROP
+}
 
-class GameWindow(tk.Tk):
-    def __init__(self):
+class GameWindow(tk.Tk, GameListener):
+    # A Profiler times input handling, game actions, ticks and redraws. Without one, nothing is timed
+    def __init__(self, sound = True, profiler = None):
         super(GameWindow, self).__init__()
         self.geometry(str(CANVAS_WIDTH + 100) + "x" + str(CANVAS_HEIGHT + 100)) # Width x Height
         self.title("Tetris")
@@ -28,59 +45,65 @@ class GameWindow(tk.Tk):
             self.rowconfigure(y, weight = 1)
             
         # Create the game manager and canvas
+        # The window and sound are listeners, the game itself runs without either
         self.gm = GameManager()
+        self.gm.addListener(self)
+        if (sound):
+            attachSound(self.gm)
+        self.__dirtyCells = set()
+
+        # Instrumented before the handlers below are handed to Tk
+        self.profiler = profiler
+        if (profiler is not None):
+            profiler.instrumentGame(self.gm)
+            profiler.instrumentWindow(self)
 
         self.canvas = GameCanvas(self)
         self.canvas.pack(padx = 50, pady = 50)
         
         # Game timer
-        self.timer = RepeatedTimer(1.0, self.__tick)
+        # Runs on the Tk main loop, so ticks never touch widgets from another thread
+        self.timer = TkGameLoop(self, 1.0, self.__tick)
 
-        # Keyboard input
-        self.bind("<Key>", self.__keyEventListener)
+        # Keyboard input. Key events only update which keys are held, the frame loop applies them
+        # and redraws the window once, however many came in
+        self.inputs = InputEngine(self.gm, gravityInterval = self.timer.interval)
+        self.frameLoop = TkGameLoop(self, FRAME_INTERVAL, self.__frame)
+        self.bind("<KeyPress>", self.__keyEventListener)
+        self.bind("<KeyRelease>", self.__keyReleaseListener)
+        self.bind("<FocusOut>", lambda event: self.inputs.releaseAll())
         
         self.__updateWindow()
         
+    # The window is redrawn by the next frame
     def __tick(self):
         self.gm.tick()
+
+    def __frame(self):
+        self.inputs.update()
         self.__updateWindow()
 
+    # Collect the changed blocks, so only they are redrawn
+    def onUpdate(self, dirtyCells):
+        self.__dirtyCells.update(dirtyCells)
+
+    def onGameOver(self):
+        self.title("Tetris - Game Over")
+
     def __updateWindow(self):
-        mino = self.gm.currentMino
-        
-        # if (mino.prevState != mino.currentState):
-        #     for block in mino.states[mino.prevState]:
-        #         relRow, relCol = block.relCoords
-        #         absRow, absCol = mino.absCoords
-        #         if ((absRow + relRow) <= 2):
-        #             self.canvas.frameGrid[absRow + relRow][absCol + relCol].config(bg = MARGIN_COLOR)
-        #         else:
-        #             self.canvas.frameGrid[absRow + relRow][absCol + relCol].config(bg = BASE_COLOR)
-
-        # Update current state blocks
-        for row in range(0, BOARD_HEIGHT):
-            for col in range(0, BOARD_WIDTH):
-                self.canvas.labelGrid[row][col].config(bg = self.gm.board.blockGrid[row][col].getColor())
+        if (len(self.__dirtyCells) == 0):
+            return
+
+        # Update changed blocks only
+        for row, col in self.__dirtyCells:
+            self.canvas.setBlockColor(row, col, self.gm.getBlockColor(row, col))
+        self.__dirtyCells.clear()
 
     def __keyEventListener(self, event):
-        if (event.keysym == "Up" or event.keysym == "x"):
-            self.gm.cw()
-        elif (event.keysym == "z" or event.keysym == "Control_L"):
-            self.gm.ccw()
-        elif (event.keysym == "a"):
-            self.gm.reverse()
-        elif (event.keysym == "Down"):
-            self.gm.softDrop()
-        elif (event.keysym == "Left"):
-            self.gm.moveLeft()
-        elif (event.keysym == "Right"):
-            self.gm.moveRight()
-        elif (event.keysym == "c" or event.keysym == "Shift_L"):
-            self.gm.hold()
-        elif (event.keysym == "space"):
-            self.gm.hardDrop()
-            
-        self.__updateWindow()
+        self.inputs.keyDown(KEY_ACTIONS.get(event.keysym, Action.NONE))
+
+    def __keyReleaseListener(self, event):
+        self.inputs.keyUp(KEY_ACTIONS.get(event.keysym, Action.NONE))
 
 class GameCanvas(tk.Canvas):
     def __init__(self, window):
@@ -89,64 +112,52 @@ class GameCanvas(tk.Canvas):
         self.configure(
             width = BOARD_WIDTH * BLOCK_SIZE,
             height = BOARD_HEIGHT * BLOCK_SIZE,
-            bg = "firebrick1"
+            bg = "firebrick1",
+            highlightthickness = 0
         )
         
-        # Visualize the block grid via frames
-        self.labelGrid = [[None for row in range(BOARD_WIDTH)] for col in range(BOARD_HEIGHT)] 
+        # Visualize the block grid via rectangles, and remember the color each one was last drawn with
+        self.rectGrid = [[None for row in range(BOARD_WIDTH)] for col in range(BOARD_HEIGHT)] 
+        self.colorGrid = [[None for row in range(BOARD_WIDTH)] for col in range(BOARD_HEIGHT)] 
        
-        # Create grid managers for the board
-        for col in range(0, BOARD_WIDTH):
-            self.columnconfigure(col, weight = 1)
-        for row in range(0, BOARD_HEIGHT):
-            self.rowconfigure(row, weight = 1)
-        
-        # Upper 3 rows should be blank
-        for y in range(0, 3):
-            for x in range(0, BOARD_WIDTH):
-                frame = BlockLabel(
-                    self,
-                    bg=MARGIN_COLOR,
-                    width = BLOCK_SIZE,
-                    height = BLOCK_SIZE,
-                    relief = tk.SOLID,
-                    borderwidth = 1,
-                )
-                frame.bind("<Button-1>", lambda event: self.createTestBlock(event, window))
-                frame.bind("<Button-3>", lambda event: self.destroyTestBlock(event, window))
-                frame.absCoords = (y, x)
-                frame.grid(row = y, column = x)
-                self.labelGrid[y][x] = frame
-
-        # Main board blocks
-        for y in range(3, BOARD_HEIGHT):
+        # Upper 3 rows are the margin, and get their color from the game like the rest
+        for y in range(0, BOARD_HEIGHT):
             for x in range(0, BOARD_WIDTH):
-                frame = BlockLabel(
-                    self,
-                    bg=window.gm.board.blockGrid[y][x].getColor(),
-                    width = BLOCK_SIZE,
-                    height = BLOCK_SIZE,
-                    relief = tk.SOLID,
-                    borderwidth = 1
+                color = window.gm.getBlockColor(y, x)
+                self.rectGrid[y][x] = self.create_rectangle(
+                    x * BLOCK_SIZE,
+                    y * BLOCK_SIZE,
+                    (x + 1) * BLOCK_SIZE - 1,
+                    (y + 1) * BLOCK_SIZE - 1,
+                    fill = color,
+                    outline = "black"
                 )
-                frame.bind("<Button-1>", lambda event: self.createTestBlock(event, window))
-                frame.bind("<Button-3>", lambda event: self.destroyTestBlock(event, window))
-                frame.absCoords = (y, x)
-                frame.grid(row = y, column = x)
-                self.labelGrid[y][x] = frame
+                self.colorGrid[y][x] = color
+
+        self.bind("<Button-1>", lambda event: self.createTestBlock(event, window))
+        self.bind("<Button-3>", lambda event: self.destroyTestBlock(event, window))
+
+    def setBlockColor(self, row, col, color):
+        # Skip blocks already showing the color
+        if (self.colorGrid[row][col] != color):
+            self.itemconfig(self.rectGrid[row][col], fill = color)
+            self.colorGrid[row][col] = color
+
+    def blockAt(self, event):
+        return (event.y // BLOCK_SIZE, event.x // BLOCK_SIZE)
                 
     def createTestBlock(self, event, window):
-        row, col = event.widget.absCoords
-        self.labelGrid[row][col].config(bg = TEST_COLOR)
-        window.gm.createTestBlock(event)
-        pass
+        row, col = self.blockAt(event)
+        if (0 <= row < BOARD_HEIGHT and 0 <= col < BOARD_WIDTH):
+            self.setBlockColor(row, col, TEST_COLOR)
+            window.gm.createTestBlock(row, col)
     
     def destroyTestBlock(self, event, window):
-        row, col = event.widget.absCoords
-        self.labelGrid[row][col].config(bg = BASE_COLOR)
-        window.gm.destroyTestBlock(event)
-        pass
+        row, col = self.blockAt(event)
+        if (0 <= row < BOARD_HEIGHT and 0 <= col < BOARD_WIDTH):
+            window.gm.destroyTestBlock(row, col)
+            self.setBlockColor(row, col, window.gm.getBlockColor(row, col))
         
-#if __name__ == "__main__":
-gw = GameWindow()
-gw.mainloop()
+if __name__ == "__main__":
+    gw = GameWindow(profiler = profilerFromEnvironment())
+    gw.mainloop()
@@ -0,0 +1,363 @@
+from game_manager import *
+from protocol import *
+from collections import deque
+from enum import Enum
+import asyncio
+import random
+import struct
+import time
+
+SERVER_HOST: Final = "127.0.0.1"
+SERVER_PORT: Final = 7777
+
+# Every room is stepped on one shared schedule
+TICK_INTERVAL: Final = 1 / 60
+
+# Inputs a player can queue, and how many of them are applied per tick. Inputs beyond the queue are dropped
+INPUT_QUEUE_SIZE: Final = 32
+INPUTS_PER_TICK: Final = 4
+
+# Seconds a room may take per tick. A room that goes over skips ticks until the time is paid back, each one
+# skipped paying back a budget's worth, so a slow room can't hold up the others
+ROOM_TICK_BUDGET: Final = 0.002
+
+# Bytes waiting to be sent to a client before its state updates are skipped, and seconds it can stay over that
+# before it's disconnected. A client that had an update skipped gets a keyframe of that game once it catches up
+SEND_HIGH_WATER: Final = 64 * 1024
+SLOW_CLIENT_TIMEOUT: Final = 5.0
+
+# A frame is a header (payload length, message type) followed by the payload
+FRAME_HEADER: Final = struct.Struct("!HB")
+
+class MessageType(Enum):
+    # Client to server
+    JOIN = 1    # Room name, UTF-8
+    INPUT = 2   # Action values, 1 byte each
+    LEAVE = 3
+    # Server to client
+    JOINED = 16 # Player id, room seed
+    STATE = 17  # Player id, then a protocol keyframe or delta
+    ERROR = 18  # Message, UTF-8
+
+JOINED_FORMAT: Final = struct.Struct("!HQ")
+PLAYER_FORMAT: Final = struct.Struct("!H")
+
+def encodeFrame(messageType, payload = b""):
+    return FRAME_HEADER.pack(len(payload), messageType.value) + payload
+
+# (MessageType, payload), or None once the stream ends
+async def readFrame(reader):
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+        length, messageType = FRAME_HEADER.unpack(header)
+        payload = await reader.readexactly(length)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+    try:
+        return MessageType(messageType), payload
+    except ValueError:
+        return None
+
+class Player(object):
+    # A client's game in a room
+    __slots__ = ("id", "gm", "encoder", "writer", "room", "inputs", "staleGames", "skippedSends", "slowSince")
+
+    def __init__(self, id, gm, writer, room):
+        self.id = id
+        self.gm = gm
+        self.encoder = StateEncoder(gm)
+        self.writer = writer
+        self.room = room
+        self.inputs = deque()
+        # Ids of the games this client needs a keyframe of, because it hasn't seen them or missed a delta
+        self.staleGames = set()
+        self.skippedSends = 0
+        # When the client last went over the high water mark, or None if it's under it
+        self.slowSince = None
+
+class AttackListener(GameListener):
+    # Passes a player's attacks on to their room
+    def __init__(self, room, player):
+        super(AttackListener, self).__init__()
+        self.room = room
+        self.player = player
+
+    def onAttack(self, lines):
+        self.room.attack(self.player, lines)
+
+class Room(object):
+    # Players in a room play the same tetrominos, see each other's games, and attack each other with garbage
+    def __init__(self, name, seed):
+        self.name = name
+        self.seed = seed
+        self.players = []
+        self.overBudget = 0
+        self.deferredTicks = 0
+        # Seconds over budget not paid back yet
+        self.debt = 0.0
+
+        # Garbage holes come from the room's seed, and attacks go to the other players in turn
+        self.random = random.Random(seed)
+        self.__attackTurn = 0
+
+    # Send garbage from a player to the next opponent still playing. It comes in after their next placement
+    # that clears nothing
+    def attack(self, sender, lines):
+        targets = [player for player in self.players if player is not sender and not player.gm.gameOver]
+        if (len(targets) == 0):
+            return
+        self.__attackTurn += 1
+        target = targets[self.__attackTurn % len(targets)]
+        target.gm.receiveGarbage(lines, self.random.randrange(0, BOARD_WIDTH))
+
+    # Apply queued inputs and tick every game. Returns (player, STATE frame of its delta) for every player, the
+    # frame being None if the game didn't change
+    def step(self):
+        updates = []
+        for player in self.players:
+            gm = player.gm
+            for i in range(0, min(INPUTS_PER_TICK, len(player.inputs))):
+                gm.perform(player.inputs.popleft())
+            gm.tick()
+
+            # The delta is encoded once and sent as is to everyone in the room
+            delta = player.encoder.encodeTick()
+            if (delta is not None):
+                delta = encodeFrame(MessageType.STATE, PLAYER_FORMAT.pack(player.id) + delta)
+            updates.append((player, delta))
+        return updates
+
+class GameServer(object):
+    # Authoritative server for many rooms of headless games over TCP. Clients send inputs, which are applied on the
+    # server's own schedule, and get every game in their room back whenever it changes
+    # Rooms that go over their tick budget are deferred, and slow clients have state updates skipped rather than
+    # queued, until they've been behind for too long and are disconnected
+    def __init__(self, host = SERVER_HOST, port = SERVER_PORT, tickInterval = TICK_INTERVAL,
+                 sendHighWater = SEND_HIGH_WATER, slowClientTimeout = SLOW_CLIENT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.tickInterval = tickInterval
+        self.sendHighWater = sendHighWater
+        self.slowClientTimeout = slowClientTimeout
+        self.rooms = {}
+        self.__nextPlayerId = 1
+        self.__server = None
+        self.__scheduler = None
+        self.__roomOrder = 0
+
+        # Stats
+        self.ticks = 0
+        self.missedTicks = 0
+        self.disconnects = 0
+
+    async def start(self):
+        self.__server = await asyncio.start_server(self.__handleClient, self.host, self.port)
+        self.port = self.__server.sockets[0].getsockname()[1]
+        self.__scheduler = asyncio.create_task(self.__run())
+
+    async def close(self):
+        if (self.__scheduler is not None):
+            self.__scheduler.cancel()
+            self.__scheduler = None
+        if (self.__server is not None):
+            self.__server.close()
+            for room in list(self.rooms.values()):
+                for player in list(room.players):
+                    player.writer.close()
+            await self.__server.wait_closed()
+            self.__server = None
+
+    async def __run(self):
+        loop = asyncio.get_running_loop()
+        nextTime = loop.time()
+        while (True):
+            self.step()
+            nextTime += self.tickInterval
+            now = loop.time()
+            # Ticks that are already late are skipped instead of run back to back
+            if (now > nextTime):
+                missed = int((now - nextTime) / self.tickInterval) + 1
+                self.missedTicks += missed
+                nextTime += missed * self.tickInterval
+            await asyncio.sleep(nextTime - now)
+
+    # One tick of every room. Rooms take turns going first, so none is always the one left waiting
+    def step(self):
+        self.ticks += 1
+        rooms = list(self.rooms.values())
+        if (len(rooms) == 0):
+            return
+        self.__roomOrder = (self.__roomOrder + 1) % len(rooms)
+        for room in rooms[self.__roomOrder:] + rooms[:self.__roomOrder]:
+            if (room.debt > 0):
+                room.debt = max(0.0, room.debt - ROOM_TICK_BUDGET)
+                room.deferredTicks += 1
+                continue
+            start = time.perf_counter()
+            for player, delta in room.step():
+                keyframe = None
+                for viewer in list(room.players):
+                    if (player.id in viewer.staleGames):
+                        # Built at most once a tick, and only when someone needs it
+                        if (keyframe is None):
+                            keyframe = encodeFrame(MessageType.STATE, PLAYER_FORMAT.pack(player.id) + player.encoder.encodeKeyframe())
+                        if (self.__send(viewer, keyframe)):
+                            viewer.staleGames.discard(player.id)
+                    elif (delta is not None and not self.__send(viewer, delta)):
+                        viewer.staleGames.add(player.id)
+            elapsed = time.perf_counter() - start
+            if (elapsed > ROOM_TICK_BUDGET):
+                room.overBudget += 1
+                room.debt = elapsed - ROOM_TICK_BUDGET
+
+    # Whether the frame was written
+    def __send(self, player, frame):
+        transport = player.writer.transport
+        if (transport.is_closing()):
+            return False
+        if (transport.get_write_buffer_size() > self.sendHighWater):
+            # Nothing more is written while it's over, so it's how long it stays there that gives a client away
+            now = time.monotonic()
+            if (player.slowSince is None):
+                player.slowSince = now
+            elif (now - player.slowSince >= self.slowClientTimeout):
+                self.disconnects += 1
+                transport.abort()
+                return False
+            player.skippedSends += 1
+            return False
+        player.slowSince = None
+        player.writer.write(frame)
+        return True
+
+    def __join(self, name, writer):
+        room = self.rooms.get(name)
+        if (room is None):
+            room = Room(name, randomSeed())
+            self.rooms[name] = room
+        player = Player(self.__nextPlayerId, GameManager(room.seed), writer, room)
+        player.gm.addListener(AttackListener(room, player))
+        self.__nextPlayerId += 1
+        room.players.append(player)
+        for other in room.players:
+            other.staleGames.add(player.id)
+            player.staleGames.add(other.id)
+        return player
+
+    def __leave(self, player):
+        room = player.room
+        if (player in room.players):
+            room.players.remove(player)
+            for other in room.players:
+                other.staleGames.discard(player.id)
+        if (len(room.players) == 0 and self.rooms.get(room.name) is room):
+            del self.rooms[room.name]
+
+    async def __handleClient(self, reader, writer):
+        player = None
+        try:
+            while (True):
+                message = await readFrame(reader)
+                if (message is None):
+                    break
+                messageType, payload = message
+
+                if (messageType == MessageType.JOIN):
+                    try:
+                        name = payload.decode("utf-8")
+                    except UnicodeDecodeError:
+                        writer.write(encodeFrame(MessageType.ERROR, b"Room name isn't UTF-8"))
+                        break
+                    if (player is not None):
+                        self.__leave(player)
+                    player = self.__join(name, writer)
+                    writer.write(encodeFrame(MessageType.JOINED, JOINED_FORMAT.pack(player.id, player.room.seed)))
+                    # Replies aren't checked like state updates, so a client joining over and over has to read them
+                    await writer.drain()
+                elif (messageType == MessageType.INPUT and player is not None):
+                    for value in payload:
+                        if (len(player.inputs) < INPUT_QUEUE_SIZE and 0 < value < PLAYABLE_ACTION_COUNT):
+                            player.inputs.append(Action(value))
+                elif (messageType == MessageType.LEAVE):
+                    break
+                else:
+                    # Protocol errors close the connection, so replying to them can't pile up unread
+                    writer.write(encodeFrame(MessageType.ERROR, b"Unexpected message"))
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            if (player is not None):
+                self.__leave(player)
+            writer.close()
+
+    def getStats(self):
+        players = [player for room in self.rooms.values() for player in room.players]
+        return {
+            "rooms": len(self.rooms),
+            "players": len(players),
+            "ticks": self.ticks,
+            "missedTicks": self.missedTicks,
+            "overBudget": sum(room.overBudget for room in self.rooms.values()),
+            "deferredTicks": sum(room.deferredTicks for room in self.rooms.values()),
+            "skippedSends": sum(player.skippedSends for player in players),
+            "disconnects": self.disconnects
+        }
+
+class GameClient(object):
+    # Connection to a GameServer, for bots, spectating tools and testing over loopback
+    # Every game in the room is kept up to date in games, a StateDecoder by player id
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.playerId = None
+        self.seed = None
+        self.games = {}
+
+    async def connect(self, host = SERVER_HOST, port = SERVER_PORT):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+
+    # Join a room, creating it if it doesn't exist. Returns the player id
+    async def join(self, name):
+        self.writer.write(encodeFrame(MessageType.JOIN, name.encode("utf-8")))
+        self.games = {}
+        while (True):
+            message = await self.receive()
+            if (message is None):
+                return None
+            messageType, payload = message
+            if (messageType == MessageType.JOINED):
+                self.playerId, self.seed = JOINED_FORMAT.unpack(payload)
+                return self.playerId
+
+    def sendInputs(self, actions):
+        self.writer.write(encodeFrame(MessageType.INPUT, bytes(action.value for action in actions)))
+
+    async def receive(self):
+        message = await readFrame(self.reader)
+        if (message is not None and message[0] == MessageType.STATE):
+            playerId, = PLAYER_FORMAT.unpack_from(message[1])
+            game = self.games.get(playerId)
+            if (game is None):
+                game = StateDecoder()
+                self.games[playerId] = game
+            game.apply(memoryview(message[1])[PLAYER_FORMAT.size:])
+        return message
+
+    async def close(self):
+        if (self.writer is not None):
+            self.writer.write(encodeFrame(MessageType.LEAVE))
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+            self.writer = None
+
+if __name__ == "__main__":
+    async def main():
+        server = GameServer()
+        await server.start()
+        print("Listening on " + server.host + ":" + str(server.port))
+        await asyncio.Event().wait()
+    asyncio.run(main())
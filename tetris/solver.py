@@ -0,0 +1,244 @@
+from move_generator import *
+import time
+
+# Seconds a search may run before giving up, short enough to run between frames of a live game
+SOLVER_TIME_BUDGET: Final = 0.5
+
+# Nodes searched between looks at the clock
+CLOCK_INTERVAL: Final = 1024
+
+# Bits a field's height takes in the search's memo keys
+HEIGHT_BITS: Final = BOARD_HEIGHT.bit_length()
+
+# A field is the bottom rows of a board packed into one int, bit (fieldRow * BOARD_WIDTH + col)
+# Field row 0 is the bottom row of the board, so clearing a row shifts the ones above it down in both
+
+# Every distinct shape of a tetromino as (mask, width, height), with its lowest, leftmost block at bit 0
+# Indexed [shapeId]. States covering the same shape (e.g. all of O's) are only listed once
+def _buildShapeMasks():
+    shapeMasks = []
+    for states in STATE_CELLS:
+        shapes = []
+        for cells in states:
+            lowestRow = max(relRow for relRow, relCol in cells)
+            leftCol = min(relCol for relRow, relCol in cells)
+            mask = 0
+            for relRow, relCol in cells:
+                mask |= 1 << ((lowestRow - relRow) * BOARD_WIDTH + relCol - leftCol)
+            width = max(relCol for relRow, relCol in cells) - leftCol + 1
+            height = lowestRow - min(relRow for relRow, relCol in cells) + 1
+            if (all(mask != shape[0] for shape in shapes)):
+                shapes.append((mask, width, height))
+        shapeMasks.append(tuple(shapes))
+    return tuple(shapeMasks)
+
+SHAPE_MASKS: Final = _buildShapeMasks()
+
+# Bits of a column, and of every column left of it, for a field of each height. Indexed [height][col]
+COLUMN_MASKS: Final = tuple(
+    tuple(sum(1 << (row * BOARD_WIDTH + col) for row in range(0, height)) for col in range(0, BOARD_WIDTH))
+    for height in range(0, BOARD_HEIGHT + 1)
+)
+LEFT_MASKS: Final = tuple(
+    tuple(sum(COLUMN_MASKS[height][left] for left in range(0, col)) for col in range(0, BOARD_WIDTH))
+    for height in range(0, BOARD_HEIGHT + 1)
+)
+
+# The bottom rows of a board as a field, or None if there are blocks above them
+def boardToField(board, height):
+    if (any(board.rows[0:BOARD_HEIGHT - height])):
+        return None
+    field = 0
+    for fieldRow in range(0, height):
+        field |= board.rows[BOARD_HEIGHT - 1 - fieldRow] << (fieldRow * BOARD_WIDTH)
+    return field
+
+# Board (row, col) of every block of a field mask
+def fieldToCoords(mask):
+    coords = []
+    while (mask):
+        bit = (mask & -mask).bit_length() - 1
+        coords.append((BOARD_HEIGHT - 1 - bit // BOARD_WIDTH, bit % BOARD_WIDTH))
+        mask &= mask - 1
+    return coords
+
+# Field with its full rows removed, and its new height
+def clearFieldRows(field, height):
+    fieldRow = 0
+    while (fieldRow < height):
+        if ((field >> (fieldRow * BOARD_WIDTH)) & FULL_ROW == FULL_ROW):
+            below = field & ((1 << (fieldRow * BOARD_WIDTH)) - 1)
+            field = below | ((field >> ((fieldRow + 1) * BOARD_WIDTH)) << (fieldRow * BOARD_WIDTH))
+            height -= 1
+        else:
+            fieldRow += 1
+    return field, height
+
+# Masks of every position a shape can be hard dropped to from above a field, without sticking out of its top
+def dropMasks(field, height, shapeId):
+    masks = []
+    for mask, width, pieceHeight in SHAPE_MASKS[shapeId]:
+        for col in range(0, BOARD_WIDTH - width + 1):
+            # Start just above the field, where it's empty, and fall until something is below
+            fieldRow = height
+            shifted = mask << (fieldRow * BOARD_WIDTH + col)
+            while (fieldRow > 0 and not (shifted >> BOARD_WIDTH) & field):
+                shifted >>= BOARD_WIDTH
+                fieldRow -= 1
+            if (fieldRow + pieceHeight <= height):
+                masks.append(shifted)
+    return masks
+
+class SolverResult(object):
+    # Placements that reach the goal (None if none were found) and how the search went
+    __slots__ = ("placements", "nodes", "elapsed", "timeToSolution", "timedOut")
+
+    def __init__(self, placements, nodes, elapsed, timeToSolution, timedOut):
+        self.placements = placements
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.timeToSolution = timeToSolution
+        self.timedOut = timedOut
+
+    def isSolved(self):
+        return self.placements is not None
+
+    def getNodesPerSecond(self):
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+class Solver(object):
+    # Depth first search over the current tetromino and the preview for a perfect clear or an opening
+    # Placements after the first are hard drops, since the stack never reaches the spawn rows. The first one
+    # can be anything reachable from where the current tetromino is. Dead ends are memoized by field, height
+    # and depth, and pruned when too few tetrominos are left or a filled column walls off a region of empty
+    # blocks that isn't a multiple of 4
+    def __init__(self, timeBudget = SOLVER_TIME_BUDGET):
+        self.timeBudget = timeBudget
+
+    # Clear the bottom rows of the board entirely, leaving it empty
+    def solvePerfectClear(self, gm, height = 4):
+        field = boardToField(gm.board, height)
+        if (field is None):
+            return SolverResult(None, 0, 0.0, None, False)
+        return self.__search(gm, field, height, None)
+
+    # Fill the bottom rows of the board to match the given rows, top first like Board.rows
+    # The target can't have full rows, so nothing is cleared on the way
+    def solveOpening(self, gm, targetRows):
+        height = len(targetRows)
+        field = boardToField(gm.board, height)
+        target = 0
+        for fieldRow, rowBits in enumerate(reversed(targetRows)):
+            target |= rowBits << (fieldRow * BOARD_WIDTH)
+        if (field is None or field & ~target or any(rowBits == FULL_ROW for rowBits in targetRows)):
+            return SolverResult(None, 0, 0.0, None, False)
+        return self.__search(gm, field, height, target)
+
+    def __search(self, gm, field, height, target):
+        start = time.perf_counter()
+        self.__deadline = start + self.timeBudget
+        self.__nodes = 0
+        self.__timedOut = False
+        self.__visited = set()
+        self.__target = target
+        self.__solution = []
+
+        if (target is None):
+            goalBlocks = height * BOARD_WIDTH
+        else:
+            goalBlocks = target.bit_count()
+        pieces = (goalBlocks - field.bit_count()) // 4
+
+        mino = gm.currentMino
+        self.__shapes = [mino.shapeId] + [bag.value for bag in gm.getPreview(pieces - 1)]
+        # Memo keys pack the depth below the height, in as many bits as the deepest search needs
+        self.__depthBits = len(self.__shapes).bit_length()
+
+        # The first tetromino's placements, by their mask of the field
+        self.__firstPlacements = {}
+        if (not gm.gameOver):
+            for placement in generatePlacements(gm.board, mino.shapeId, mino.currentState, mino.absCoords):
+                mask = 0
+                for row, col in placement.getCoords():
+                    fieldRow = BOARD_HEIGHT - 1 - row
+                    if (fieldRow >= height):
+                        break
+                    mask |= 1 << (fieldRow * BOARD_WIDTH + col)
+                else:
+                    self.__firstPlacements[mask] = placement
+
+        solved = (goalBlocks - field.bit_count()) % 4 == 0 and self.__solve(field, height, 0)
+        elapsed = time.perf_counter() - start
+        if (not solved):
+            return SolverResult(None, self.__nodes, elapsed, None, self.__timedOut)
+
+        self.__solution.reverse()
+        return SolverResult(self.__toPlacements(gm.board), self.__nodes, elapsed, elapsed, False)
+
+    def __solve(self, field, height, depth):
+        self.__nodes += 1
+        if (self.__nodes % CLOCK_INTERVAL == 0 and time.perf_counter() > self.__deadline):
+            self.__timedOut = True
+        if (self.__timedOut):
+            return False
+
+        target = self.__target
+        if ((target is None and height == 0) or (target is not None and field == target)):
+            return True
+        if (depth == len(self.__shapes) or self.__isDeadEnd(field, height, depth)):
+            return False
+
+        key = (((field << HEIGHT_BITS) | height) << self.__depthBits) | depth
+        if (key in self.__visited):
+            return False
+        self.__visited.add(key)
+
+        if (depth == 0):
+            masks = self.__firstPlacements.keys()
+        else:
+            masks = dropMasks(field, height, self.__shapes[depth])
+
+        for mask in masks:
+            if (mask & field or (target is not None and mask & ~target)):
+                continue
+            newField, newHeight = field | mask, height
+            if (target is None):
+                newField, newHeight = clearFieldRows(newField, height)
+            if (self.__solve(newField, newHeight, depth + 1)):
+                self.__solution.append(mask)
+                return True
+        return False
+
+    def __isDeadEnd(self, field, height, depth):
+        if (self.__target is None):
+            empty = (height * BOARD_WIDTH) - field.bit_count()
+        else:
+            empty = self.__target.bit_count() - field.bit_count()
+        if (empty > 4 * (len(self.__shapes) - depth)):
+            return True
+
+        # Tetrominos can't cross a filled column, so the empty blocks left of one have to be filled on their own
+        if (self.__target is None):
+            for col in range(1, BOARD_WIDTH):
+                column = COLUMN_MASKS[height][col]
+                if (field & column == column and (LEFT_MASKS[height][col] & ~field).bit_count() % 4 != 0):
+                    return True
+        return False
+
+    # Placements with input paths for the solution's masks, replayed on a copy of the board
+    def __toPlacements(self, board):
+        board = board.copy()
+        placements = []
+        for depth, mask in enumerate(self.__solution):
+            if (depth == 0):
+                placement = self.__firstPlacements[mask]
+            else:
+                footprint = frozenset(fieldToCoords(mask))
+                for placement in generateDropPlacements(board, self.__shapes[depth]):
+                    if (frozenset(placement.getCoords()) == footprint):
+                        break
+            coords = placement.getCoords()
+            board.place(coords, placement.shapeId + 1)
+            board.clearFullRows(set(row for row, col in coords))
+            placements.append(placement)
+        return placements
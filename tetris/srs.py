@@ -0,0 +1,114 @@
+from typing import Final
+from tetrominos import *
+
+# Super Rotation System kick tests, keyed by (currentState, desiredState)
+# Tests are (x, y) offsets with Y pointing up, and are tried in order until one fits
+# 0 = spawn state, 1 = R, 2 = two successive rotations, 3 = L
+
+# For J, L, S, T, and Z tetrominos (SRS)
+KICKS: Final = {
+    (0, 1): [(0,0), (-1,0), (-1,1), (0,-2), (-1,-2)], # 0 -> R
+    (0, 3): [(0,0), (1,0), (1,1), (0,-2), (1,-2)],    # 0 -> L
+    (1, 2): [(0,0), (1,0), (1,-1), (0,2), (1,2)],     # R -> 2
+    (1, 0): [(0,0), (1,0), (1,-1), (0,2), (1,2)],     # R -> 0
+    (2, 3): [(0,0), (1,0), (1,1), (0,-2), (1,-2)],    # 2 -> L
+    (2, 1): [(0,0), (-1,0), (-1,1), (0,-2), (-1,-2)], # 2 -> R
+    (3, 0): [(0,0), (-1,0), (-1,-1), (0,2), (-1,2)],  # L -> 0
+    (3, 2): [(0,0), (-1,0), (-1,-1), (0,2), (-1,2)]   # L -> 2
+}
+
+# For I tetromino (SRS+)
+KICKS_I: Final = {
+    (0, 1): [(0,0), (-2,0), (1,0), (-2,-1), (1,2)],  # 0 -> R
+    (0, 3): [(0,0), (-1,0), (2,0), (-1,2), (2,-1)],  # 0 -> L
+    (1, 2): [(0,0), (-1,0), (2,0), (-1,2), (2,-1)],  # R -> 2
+    (1, 0): [(0,0), (2,0), (-1,0), (2,1), (-1,-2)],  # R -> 0
+    (2, 3): [(0,0), (2,0), (-1,0), (2,1), (-1,-2)],  # 2 -> L
+    (2, 1): [(0,0), (1,0), (-2,0), (1,-2), (-2,1)],  # 2 -> R
+    (3, 0): [(0,0), (1,0), (-2,0), (1,-2), (-2,1)],  # L -> 0
+    (3, 2): [(0,0), (-2,0), (1,0), (-2,-1), (1,2)]   # L -> 2
+}
+
+# For all tetrominos rotating 180 degrees (SRS+)
+KICKS_180: Final = {
+    (0, 2): [(0,0), (0,1), (1,1), (-1,1), (1,0), (-1,0)],   # 0 -> 2
+    (1, 3): [(0,0), (1,0), (1,2), (1,1), (0,2), (0,1)],     # R -> L
+    (2, 0): [(0,0), (0,-1), (-1,-1), (1,-1), (-1,0), (1,0)], # 2 -> 0
+    (3, 1): [(0,0), (-1,0), (-1,2), (-1,1), (0,2), (0,1)]   # L -> R
+}
+
+# The I tetromino's offset block isn't its center, so its (row, col) wobbles before the kicks are tested
+I_WOBBLE: Final = {
+    (0, 1): (0, 1),
+    (0, 3): (1, 0),
+    (1, 2): (1, 0),
+    (1, 0): (0, -1),
+    (2, 3): (0, -1),
+    (2, 1): (-1, 0),
+    (3, 0): (-1, 0),
+    (3, 2): (0, 1),
+    (0, 2): (1, 1),   # Two successive wobbles
+    (1, 3): (1, -1),
+    (2, 0): (-1, -1),
+    (3, 1): (-1, 1)
+}
+
+# State reached by rotating 1 (cw), -1 (ccw) or 2 (reverse) from the current state
+def rotatedState(currentState, direction):
+    return (currentState + direction) % 4
+
+def _kickTests(shapeId, currentState, desiredState):
+    transition = (currentState, desiredState)
+    wobble = (0, 0)
+    if (shapeId == Bag.I.value):
+        wobble = I_WOBBLE[transition]
+
+    if (transition in KICKS_180):
+        return KICKS_180[transition], wobble
+    elif (shapeId == Bag.I.value):
+        return KICKS_I[transition], wobble
+    return KICKS[transition], wobble
+
+def _buildBottoms():
+    bottoms = []
+    for states in STATE_CELLS:
+        stateBottoms = []
+        for cells in states:
+            lowest = {}
+            for relRow, relCol in cells:
+                lowest[relCol] = max(relRow, lowest.get(relCol, relRow))
+            stateBottoms.append(tuple(sorted(lowest.items())))
+        bottoms.append(tuple(stateBottoms))
+    return tuple(bottoms)
+
+def _buildRotations():
+    rotations = []
+    for shapeId in range(0, len(TETROMINO_TYPES)):
+        fromStates = []
+        for currentState in range(0, 4):
+            toStates = []
+            for desiredState in range(0, 4):
+                kicks = ()
+                if (desiredState != currentState):
+                    tests, (rowWobble, colWobble) = _kickTests(shapeId, currentState, desiredState)
+                    kicks = []
+                    for x, y in tests:
+                        rowOffset = rowWobble - y # Flip because we start Y from the top rather than the bottom
+                        colOffset = colWobble + x
+                        cells = tuple((rowOffset + relRow, colOffset + relCol) for relRow, relCol in STATE_CELLS[shapeId][desiredState])
+                        kicks.append((rowOffset, colOffset, cells))
+                toStates.append(tuple(kicks))
+            fromStates.append(tuple(toStates))
+        rotations.append(tuple(fromStates))
+    return tuple(rotations)
+
+# Relative (row, col) of each block, indexed [shapeId][state]. The offset block is always first
+STATE_CELLS: Final = tuple(kind.states for kind in TETROMINO_TYPES)
+
+# Every kick test of a rotation, indexed [shapeId][currentState][desiredState]
+# A test is (rowOffset, colOffset, cells): the offset moves the tetromino's absolute coordinates, and the cells are
+# the desired state's blocks relative to the current absolute coordinates, with the offset (and I wobble) included
+ROTATIONS: Final = _buildRotations()
+
+# Lowest block of each column a state covers, as (relCol, relRow), indexed [shapeId][state]
+STATE_BOTTOMS: Final = _buildBottoms()
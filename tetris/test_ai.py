@@ -0,0 +1,54 @@
+from ai import *
+import unittest
+
+def _game(seed, blocks):
+    gm = GameManager(seed)
+    for row, col in blocks:
+        gm.createTestBlock(row, col)
+    return gm
+
+def _rows(row, skipCols):
+    return [(row, col) for col in range(0, BOARD_WIDTH) if col not in skipCols]
+
+# Bottom row a block short of clearing, with a shorter row on it
+STACK: Final = _rows(22, (9,)) + _rows(21, (6, 7, 8, 9))
+
+class PlacedHashTest(unittest.TestCase):
+    def testMatchesAppliedBoard(self):
+        board = _game(0, STACK).board
+        for shapeId in range(0, len(STATE_CELLS)):
+            for placement in generateDropPlacements(board, shapeId):
+                child, lines = applyPlacement(board, placement)
+                if (lines == 0):
+                    self.assertEqual(placedHash(board, placement), child.hash)
+                else:
+                    self.assertIsNone(placedHash(board, placement))
+
+class TranspositionTest(unittest.TestCase):
+    def testHasTranspositions(self):
+        self.assertTrue(hasTranspositions([Bag.T.value, Bag.O.value, Bag.T.value]))
+        self.assertFalse(hasTranspositions([Bag.T.value, Bag.O.value, Bag.I.value]))
+
+    def testTableHitsWithoutChangingScore(self):
+        # The 2 T's can go down in either order, so many boards after the last drop are reached twice
+        board = _game(0, STACK).board
+        shapes = [Bag.T.value, Bag.O.value, Bag.T.value]
+        table = TranspositionTable()
+        self.assertEqual(searchScore(board, shapes, 0, table = table), searchScore(board, shapes, 0))
+        self.assertGreater(table.getStats()["hitRate"], 0.05)
+
+        # Searching again reuses the whole result
+        hits = table.hits
+        searchScore(board, shapes, 0, table = table)
+        self.assertEqual(table.hits, hits + 1)
+
+    def testTableSkippedWithoutTranspositions(self):
+        # Seed 0 starts with 3 different tetrominos, so only the chosen move is kept
+        gm = _game(0, STACK)
+        player = AIPlayer(gm, lookahead = 2)
+        self.assertFalse(hasTranspositions([gm.currentMino.shapeId] + [bag.value for bag in gm.getPreview(2)]))
+        player.chooseMove()
+        self.assertEqual(len(player.table), 1)
+
+if __name__ == "__main__":
+    unittest.main()
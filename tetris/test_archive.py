@@ -0,0 +1,37 @@
+from archive import *
+import os
+import tempfile
+import unittest
+
+class SnapshotArchiveTest(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix = ".tsnp")
+        os.close(handle)
+        self.games = [GameManager(seed) for seed in range(0, 5)]
+        with SnapshotArchiveWriter(self.path) as writer:
+            for gm in self.games:
+                writer.append(gm)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def testRoundTrip(self):
+        gm = GameManager()
+        with SnapshotArchive(self.path) as archive:
+            self.assertEqual(len(archive), len(self.games))
+            for index, snapshot in enumerate(archive):
+                gm.restore(snapshot)
+                self.assertEqual(gm.getHash(), self.games[index].getHash())
+                self.assertEqual(bytes(snapshot), self.games[index].snapshot())
+
+    def testCloseWithSnapshotsAlive(self):
+        archive = SnapshotArchive(self.path)
+        snapshot = archive[-1]
+        archive.close()
+        # The snapshot still reads, and the archive refuses to hand out more
+        self.assertEqual(bytes(snapshot), self.games[-1].snapshot())
+        self.assertRaises(ValueError, archive.__getitem__, 0)
+        archive.close()
+
+if __name__ == "__main__":
+    unittest.main()
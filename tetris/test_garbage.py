@@ -0,0 +1,126 @@
+from game_manager import *
+import unittest
+
+# First tetromino of this seed is a T
+T_SEED: Final = 9
+
+class AttackRecorder(GameListener):
+    def __init__(self):
+        super(AttackRecorder, self).__init__()
+        self.attacks = []
+        self.lines = []
+
+    def onAttack(self, lines):
+        self.attacks.append(lines)
+
+    def onPlaced(self, linesCleared):
+        self.lines.append(linesCleared)
+
+def _game(blocks):
+    gm = GameManager(T_SEED)
+    for row, col in blocks:
+        gm.createTestBlock(row, col)
+    recorder = AttackRecorder()
+    gm.addListener(recorder)
+    return gm, recorder
+
+def _rows(row, skipCols):
+    return [(row, col) for col in range(0, BOARD_WIDTH) if col not in skipCols]
+
+class AttackTableTest(unittest.TestCase):
+    def testLineClears(self):
+        self.assertEqual([attackFor(lines, False, False, 0) for lines in range(0, 5)], [0, 0, 1, 2, 4])
+
+    def testTSpins(self):
+        self.assertEqual([attackFor(lines, True, False, 0) for lines in range(1, 4)], [2, 4, 6])
+        self.assertEqual(attackFor(0, True, True, 5), 0)
+
+    def testBackToBack(self):
+        self.assertEqual(attackFor(4, False, True, 0), 4 + BACK_TO_BACK_BONUS)
+        self.assertEqual(attackFor(2, True, True, 0), 4 + BACK_TO_BACK_BONUS)
+        # Only difficult clears get the bonus
+        self.assertEqual(attackFor(2, False, True, 0), 1)
+        self.assertTrue(isDifficultClear(4, False))
+        self.assertTrue(isDifficultClear(1, True))
+        self.assertFalse(isDifficultClear(3, False))
+        self.assertFalse(isDifficultClear(0, True))
+
+    def testCombo(self):
+        self.assertEqual([attackFor(1, False, False, combo) for combo in range(0, 6)], [0, 0, 1, 1, 2, 2])
+        # Past the end of the table the last entry holds
+        self.assertEqual(attackFor(1, False, False, 100), COMBO_ATTACK[-1])
+
+class GarbageQueueTest(unittest.TestCase):
+    def testCancelAndTake(self):
+        queue = GarbageQueue()
+        queue.receive(3, 1)
+        queue.receive(4, 7)
+        self.assertEqual(queue.cancel(2), 0)
+        self.assertEqual(queue.lines, 5)
+        self.assertEqual(queue.take(3), [(1, 1), (2, 7)])
+        self.assertEqual(queue.cancel(5), 3)
+        self.assertEqual(queue.lines, 0)
+
+    def testBytesRoundTrip(self):
+        queue = GarbageQueue()
+        for i in range(0, GARBAGE_QUEUE_SLOTS + 2):
+            queue.receive(1, i % BOARD_WIDTH)
+        copy = GarbageQueue()
+        copy.fromBytes(queue.toBytes())
+        self.assertEqual(list(copy.entries), list(queue.entries))
+        self.assertEqual(copy.lines, GARBAGE_QUEUE_SLOTS + 2)
+
+class TSpinTest(unittest.TestCase):
+    def testTSpinDouble(self):
+        # A T-slot with an overhang at (20, 3). The T drops in, turns on the floor, and turns again into the slot
+        gm, recorder = _game(_rows(22, (4,)) + _rows(21, (3, 4, 5)) + [(20, 3)])
+        self.assertEqual(gm.currentMino.shapeId, Bag.T.value)
+        for action in [Action.SOFT_DROP] * 18 + [Action.CW] + [Action.SOFT_DROP] * 2 + [Action.CW, Action.HARD_DROP]:
+            gm.perform(action)
+        self.assertEqual(recorder.lines, [2])
+        self.assertEqual(recorder.attacks, [T_SPIN_ATTACK[2]])
+        self.assertTrue(gm.backToBack)
+        self.assertEqual(gm.combo, 1)
+
+    def testRotatedThenHardDroppedIsNotASpin(self):
+        # The T turns at spawn and falls into a spot with 3 corners taken. Falling after the turn isn't a spin
+        gm, recorder = _game(_rows(22, (4,)) + _rows(21, (3, 4)) + [(20, 5)])
+        gm.perform(Action.CCW)
+        gm.perform(Action.HARD_DROP)
+        self.assertEqual(recorder.lines, [2])
+        self.assertEqual(recorder.attacks, [LINE_ATTACK[2]])
+        self.assertFalse(gm.backToBack)
+
+    def testFailedTurnKeepsTheSpin(self):
+        gm, recorder = _game(_rows(22, (4,)) + _rows(21, (3, 4, 5)) + [(20, 3)])
+        for action in [Action.SOFT_DROP] * 18 + [Action.CW] + [Action.SOFT_DROP] * 2 + [Action.CW]:
+            gm.perform(action)
+        # Wall the T in, so no turn fits
+        for row in range(0, BOARD_HEIGHT):
+            for col in range(0, BOARD_WIDTH):
+                if ((row, col) not in gm.currentCoords and gm.board.cells[row * BOARD_WIDTH + col] == 0):
+                    gm.createTestBlock(row, col)
+        coords = gm.currentMino.absCoords
+        gm.perform(Action.CW)
+        self.assertEqual(gm.currentMino.absCoords, coords)
+        self.assertTrue(gm.currentMino.spun)
+
+    def testMovingAfterTurningIsNotASpin(self):
+        gm, recorder = _game([])
+        gm.perform(Action.CW)
+        self.assertTrue(gm.currentMino.spun)
+        gm.perform(Action.LEFT)
+        self.assertFalse(gm.currentMino.spun)
+
+class GarbageInsertionTest(unittest.TestCase):
+    def testGarbageComesInAfterPlacementWithoutClear(self):
+        gm, recorder = _game([])
+        gm.receiveGarbage(2, 3)
+        gm.perform(Action.HARD_DROP)
+        for row in (BOARD_HEIGHT - 2, BOARD_HEIGHT - 1):
+            self.assertEqual(gm.board.rows[row], FULL_ROW & ~(1 << 3))
+        self.assertEqual(gm.garbage.lines, 0)
+        self.assertEqual(gm.board.heights[3], 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+from move_generator import *
+import random
+import unittest
+
+# First tetromino of this seed is a T
+T_SEED: Final = 9
+
+def _game(seed, blocks):
+    gm = GameManager(seed)
+    for row, col in blocks:
+        gm.createTestBlock(row, col)
+    return gm
+
+def _rows(row, skipCols):
+    return [(row, col) for col in range(0, BOARD_WIDTH) if col not in skipCols]
+
+# A jagged stack with holes and overhangs to tuck under
+def _randomBlocks(seed):
+    generator = random.Random(seed)
+    blocks = []
+    for col in range(0, BOARD_WIDTH):
+        for row in range(BOARD_HEIGHT - generator.randint(0, 8), BOARD_HEIGHT):
+            if (generator.random() < 0.85):
+                blocks.append((row, col))
+    return blocks
+
+class GeneratePlacementsTest(unittest.TestCase):
+    def testEmptyBoard(self):
+        # Every column of every distinct rotation, symmetric ones only counted once
+        gm = GameManager(0)
+        counts = [len(generatePlacements(gm.board, shapeId)) for shapeId in range(0, len(STATE_CELLS))]
+        self.assertEqual(counts, [9, 17, 34, 34, 17, 17, 34])
+
+    def testFootprintsAreUnique(self):
+        gm = _game(0, _randomBlocks(0))
+        for shapeId in range(0, len(STATE_CELLS)):
+            footprints = [frozenset(placement.getCoords()) for placement in generatePlacements(gm.board, shapeId)]
+            self.assertEqual(len(footprints), len(set(footprints)))
+
+    def testPathsReachTheirPlacements(self):
+        for seed in range(0, 20):
+            blocks = _randomBlocks(seed)
+            for placement in generateCurrentPlacements(_game(seed, blocks)):
+                gm = _game(seed, blocks)
+                for action in placement.path[:-1]:
+                    gm.perform(action)
+                self.assertEqual((gm.currentMino.currentState, gm.currentMino.absCoords), (placement.state, placement.absCoords))
+                self.assertEqual(gm.getDropDistance(), 0)
+                self.assertEqual(placement.path[-1], Action.HARD_DROP)
+
+    def testTuckUnderOverhang(self):
+        # The hole at the bottom left is only reachable by sliding under the overhang
+        gm = _game(0, _rows(18, (0, 1, 2, 3)) + [(row, col) for row in range(19, 21) for col in range(4, BOARD_WIDTH)])
+        footprints = set(frozenset(placement.getCoords()) for placement in generatePlacements(gm.board, Bag.O.value))
+        drops = set(frozenset(placement.getCoords()) for placement in generateDropPlacements(gm.board, Bag.O.value))
+        tucked = frozenset(((21, 4), (21, 5), (22, 4), (22, 5)))
+        self.assertIn(tucked, footprints)
+        self.assertNotIn(tucked, drops)
+
+    def testTSpinIntoSlot(self):
+        gm = _game(T_SEED, _rows(22, (4,)) + _rows(21, (3, 4, 5)) + [(20, 3)])
+        slot = frozenset(((21, 3), (21, 4), (21, 5), (22, 4)))
+        placements = [placement for placement in generateCurrentPlacements(gm) if frozenset(placement.getCoords()) == slot]
+        self.assertEqual(len(placements), 1)
+        self.assertTrue(placements[0].spun)
+
+    def testBlockedSpawn(self):
+        gm = _game(T_SEED, [(1, 4)])
+        self.assertEqual(generatePlacements(gm.board, Bag.T.value), [])
+
+if __name__ == "__main__":
+    unittest.main()
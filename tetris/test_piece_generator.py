@@ -0,0 +1,40 @@
+from replay import *
+from protocol import *
+import unittest
+
+# Seeds outside of 0 to 2^64 - 1, and the seeds they play the same as
+WRAPPED_SEEDS: Final = ((-1, MASK_64), (1 << 64, 0), ((1 << 64) + 5, 5))
+
+class SeedTest(unittest.TestCase):
+    def testSeedsWrapTo64Bits(self):
+        for seed, wrapped in WRAPPED_SEEDS:
+            self.assertEqual(PieceGenerator(seed).seed, wrapped)
+            self.assertEqual(PieceGenerator(seed).peek(14), PieceGenerator(wrapped).peek(14))
+
+    def testSnapshotRoundTrip(self):
+        for seed, wrapped in WRAPPED_SEEDS:
+            gm = GameManager(seed)
+            gm.perform(Action.HARD_DROP)
+            copy = GameManager(0)
+            copy.restore(gm.snapshot())
+            self.assertEqual(copy.getHash(), gm.getHash())
+            self.assertEqual(copy.getPreview(), gm.getPreview())
+
+    def testRecordingRoundTrip(self):
+        for seed, wrapped in WRAPPED_SEEDS:
+            gm = GameManager(seed, record = True)
+            for action in (Action.LEFT, Action.HARD_DROP, Action.CW, Action.HARD_DROP):
+                gm.perform(action)
+                gm.tick()
+            self.assertTrue(ReplayEngine(gm.getRecording()).verify())
+
+    def testKeyframeRoundTrip(self):
+        for seed, wrapped in WRAPPED_SEEDS:
+            gm = GameManager(seed)
+            decoder = StateDecoder()
+            decoder.apply(StateEncoder(gm).encodeKeyframe())
+            self.assertEqual(decoder.seed, wrapped)
+            self.assertEqual(decoder.getPreview(), gm.getPreview())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+from protocol import *
+import unittest
+
+def _matches(decoder, gm):
+    mino = gm.currentMino
+    row, col = mino.absCoords
+    return (decoder.cells == gm.board.cells and decoder.piece == (mino.shapeId, mino.currentState, row, col)
+            and decoder.pieces.position == gm.pieces.position and decoder.gameOver == gm.gameOver)
+
+class RoundTripTest(unittest.TestCase):
+    def setUp(self):
+        self.gm = GameManager(0)
+        self.encoder = StateEncoder(self.gm)
+        self.decoder = StateDecoder()
+        self.decoder.apply(self.encoder.encodeKeyframe())
+
+    def _tick(self, action = Action.NONE):
+        self.gm.perform(action)
+        self.gm.tick()
+        delta = self.encoder.encodeTick()
+        if (delta is not None):
+            self.decoder.apply(delta)
+        self.assertTrue(_matches(self.decoder, self.gm))
+
+    def testPlacements(self):
+        for action in [Action.LEFT, Action.CW, Action.HARD_DROP, Action.RIGHT, Action.RIGHT, Action.HARD_DROP]:
+            self._tick(action)
+
+    def testGameOverHoldsAfterItEnds(self):
+        # Stacking in the middle tops out after a few pieces
+        while (not self.gm.gameOver):
+            self._tick(Action.HARD_DROP)
+        # The game is frozen, but test blocks still change the board, so deltas keep coming
+        for col in range(0, 3):
+            self.gm.createTestBlock(BOARD_HEIGHT - 1, col)
+            self._tick()
+        self.assertTrue(self.decoder.gameOver)
+
+        # Until a keyframe of a new game comes in
+        self.decoder.apply(StateEncoder(GameManager(1)).encodeKeyframe())
+        self.assertFalse(self.decoder.gameOver)
+
+if __name__ == "__main__":
+    unittest.main()
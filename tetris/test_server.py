@@ -0,0 +1,122 @@
+from server import *
+import socket
+import unittest
+
+# Long enough that the scheduler never ticks during a test, so the tests step the server themselves
+MANUAL_TICKS: Final = 3600
+
+# Seconds to wait for the other end of the loopback connection
+WAIT_TIMEOUT: Final = 5
+
+# Socket buffer sizes for the client that never reads, so its connection backs up after a few KiB rather than MiB
+SMALL_BUFFER: Final = 4096
+
+async def _until(condition):
+    for i in range(0, int(WAIT_TIMEOUT / 0.01)):
+        if (condition()):
+            return
+        await asyncio.sleep(0.01)
+    raise TimeoutError()
+
+def _matches(game, gm):
+    mino = gm.currentMino
+    row, col = mino.absCoords
+    return (game.synced and game.cells == gm.board.cells and game.piece == (mino.shapeId, mino.currentState, row, col)
+            and game.pieces.position == gm.pieces.position and game.gameOver == gm.gameOver)
+
+class LoopbackTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = GameServer(port = 0, tickInterval = MANUAL_TICKS)
+        await self.server.start()
+        self.client = GameClient()
+        await self.client.connect(port = self.server.port)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.close()
+
+    # Read the client's messages until its copy of the player's game matches the server's
+    async def _sync(self, player):
+        while (not _matches(self.client.games.get(player.id, StateDecoder()), player.gm)):
+            self.assertIsNotNone(await asyncio.wait_for(self.client.receive(), WAIT_TIMEOUT))
+
+    async def testInputsAreSynced(self):
+        playerId = await self.client.join("room")
+        player = self.server.rooms["room"].players[0]
+        self.assertEqual((playerId, self.client.seed), (player.id, player.gm.pieces.seed))
+
+        self.server.step()
+        await self._sync(player)
+
+        actions = [Action.LEFT, Action.LEFT, Action.CW, Action.HARD_DROP, Action.RIGHT]
+        self.client.sendInputs(actions)
+        await _until(lambda: len(player.inputs) == len(actions))
+        for i in range(0, (len(actions) + INPUTS_PER_TICK - 1) // INPUTS_PER_TICK):
+            self.server.step()
+        await self._sync(player)
+
+        self.assertEqual(len(player.inputs), 0)
+        self.assertEqual(player.gm.pieces.position, 2)
+        self.assertNotEqual(self.client.games[playerId].cells, bytearray(BOARD_WIDTH * BOARD_HEIGHT))
+
+    async def testOverBudgetRoomIsDeferred(self):
+        await self.client.join("room")
+        room = self.server.rooms["room"]
+        gm = room.players[0].gm
+        self.server.step()
+
+        # Half a budget over still costs a whole tick
+        room.debt = ROOM_TICK_BUDGET * 1.5
+        frame = gm.frame
+        self.server.step()
+        self.server.step()
+        self.assertEqual((gm.frame, room.deferredTicks), (frame, 2))
+        self.server.step()
+        self.assertEqual(gm.frame, frame + 1)
+
+    async def testBadRoomNameCloses(self):
+        self.client.writer.write(encodeFrame(MessageType.JOIN, b"\xff"))
+        message = await asyncio.wait_for(readFrame(self.client.reader), WAIT_TIMEOUT)
+        self.assertEqual(message[0], MessageType.ERROR)
+        self.assertIsNone(await asyncio.wait_for(readFrame(self.client.reader), WAIT_TIMEOUT))
+        self.assertEqual(self.server.rooms, {})
+
+    async def testUnexpectedMessageCloses(self):
+        # Inputs before joining
+        self.client.sendInputs([Action.LEFT])
+        message = await asyncio.wait_for(readFrame(self.client.reader), WAIT_TIMEOUT)
+        self.assertEqual(message[0], MessageType.ERROR)
+        self.assertIsNone(await asyncio.wait_for(readFrame(self.client.reader), WAIT_TIMEOUT))
+
+class SlowClientTest(unittest.IsolatedAsyncioTestCase):
+    async def testClientThatNeverReadsIsDisconnected(self):
+        server = GameServer(port = 0, tickInterval = MANUAL_TICKS, sendHighWater = SMALL_BUFFER, slowClientTimeout = 0.0)
+        await server.start()
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SMALL_BUFFER)
+        sock.connect(("127.0.0.1", server.port))
+        try:
+            sock.sendall(encodeFrame(MessageType.JOIN, b"room"))
+            await _until(lambda: "room" in server.rooms)
+            player = server.rooms["room"].players[0]
+            player.writer.transport.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SMALL_BUFFER)
+
+            # Test blocks going in and out change the board every tick, so every tick sends a delta
+            for i in range(0, 100000):
+                if (i % 2 == 0):
+                    player.gm.createTestBlock(BOARD_HEIGHT - 1, 0)
+                else:
+                    player.gm.destroyTestBlock(BOARD_HEIGHT - 1, 0)
+                server.step()
+                await asyncio.sleep(0)
+                if (server.disconnects > 0):
+                    break
+            self.assertEqual(server.disconnects, 1)
+            self.assertGreater(player.skippedSends, 0)
+            await _until(lambda: "room" not in server.rooms)
+        finally:
+            sock.close()
+            await server.close()
+
+if __name__ == "__main__":
+    unittest.main()
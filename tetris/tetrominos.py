@@ -4,6 +4,13 @@ from enum import Enum
 BASE_COLOR: Final = "#302f2f"
 MARGIN_COLOR: Final = "#020c18"
 TEST_COLOR: Final = "#bbbbbb"
+GARBAGE_COLOR: Final = "#6e6e6e"
+
+# Palette for the board's color plane
+# Index 0 is an empty block, and each tetromino uses its Bag value + 1
+PALETTE: Final = [BASE_COLOR, "#ffe020", "#00d0ff", "#4080ff", "#ff8020", "#40d040", "#ff4020", "#a040f0", TEST_COLOR, GARBAGE_COLOR]
+TEST_COLOR_ID: Final = 8
+GARBAGE_COLOR_ID: Final = 9
 
 class Bag(Enum):
     O = 0
@@ -14,181 +21,112 @@ class Bag(Enum):
     Z = 5
     T = 6
 
-class Block(object): 
-    def __init__(self, row = 0, col = 0):
-        self.relCoords = (row, col)
-        self.isOccupied = False
-        self.isCurrent = False
-        self.isPlaced = False
-        self._color = BASE_COLOR
-        
+class TetrominoShape(object):
+    # Shared description of a tetromino type. Only one exists per type, and it never changes
+    # States are tuples of relative (row, col) blocks, with the offset block first
+    __slots__ = ("shape", "shapeId", "colorId", "states")
+
+    def __init__(self, shape, bag, states):
+        self.shape = shape
+        self.shapeId = bag.value
+        self.colorId = bag.value + 1
+        self.states = tuple(tuple(state) for state in states)
+
     def getColor(self):
-        return self._color
-    
-    def setColor(self, color):
-        self._color = color
+        return PALETTE[self.colorId]
 
 class Tetromino(object):
-    # Tetromino is created. We can assume it is the current piece the player is using
-    # The fields are set via the child's __init__()
-    def __init__(self):
+    # The piece the player is using. GameManager reuses one for every spawn, so spawning doesn't allocate
+    # Everything about the type comes from its TetrominoShape; only the state and position belong to the piece
+    __slots__ = ("kind", "shape", "shapeId", "colorId", "currentState", "prevState", "absCoords", "prevAbsCoords", "spun")
+
+    def __init__(self, kind, absCoords = (0, 0)):
+        self.spawn(kind, absCoords)
+
+    def spawn(self, kind, absCoords):
+        self.kind = kind
+        self.shape = kind.shape
+        self.shapeId = kind.shapeId
+        self.colorId = kind.colorId
         self.currentState = 0
         self.prevState = 0
-        self.absCoords = (0, 0)
-        self.prevAbsCoords = (0, 0)
-        self._states = [[Block(), Block(), Block(), Block()] * 4]
-        self.shape = "Null"
+        self.absCoords = absCoords
+        self.prevAbsCoords = absCoords
         self.spun = False
-        
-    def _setColor(self, color):
-        for state in self._states:
-            for block in state:
-                block.setColor(color)
-             
-    def _setStates(self, states):
-        self._states = states
                 
     def getStates(self):
-        return self._states
+        return self.kind.states
 
     def getStateBlocks(self, desiredState):
-        return self.getStates()[desiredState]
-
-    def updateCurrentBlockState(self):
-        # Set all states to False
-        for state in self._states:
-            for block in state:
-                block.isCurrent = False
-                block.isOccupied = False
-
-        # Only set the current state to True
-        for block in self.getStateBlocks(self.currentState):
-            block.isCurrent = True
-            block.isOccupied = True
-    
-    def tetrominoPlaced(self):
-        self.updateCurrentBlockState()        
-
-        for block in self.getStateBlocks(self.currentState):
-            block.isCurrent = False
-            block.isOccupied = True
-            block.isPlaced = True
-            
-    
-class O(Tetromino):
-    def __init__(self):
-        super(O, self).__init__()
-        
-        # Does not rotate at all                  ##
-        # Offset is based on bottom left block -> ##
-        self._setStates([
-            [Block(), Block(-1, 0), Block(0, 1), Block(-1, 1)], # Facing up
-            [Block(), Block(-1, 0), Block(0, 1), Block(-1, 1)], # Facing right
-            [Block(), Block(-1, 0), Block(0, 1), Block(-1, 1)], # Facing down
-            [Block(), Block(-1, 0), Block(0, 1), Block(-1, 1)]  # Facing left
-        ])
-        self._setColor("#ffe020")
-        self.updateCurrentBlockState()
-        self.shape = "O"
-
-class I(Tetromino):
-    def __init__(self):
-        super(I, self).__init__()
-        
-        # Offset is based on middle right block ####
-        #                                         ^
-        self._setStates([
-            [Block(), Block(0, -1), Block(0, 1), Block(0, 2)], # Facing up
-            [Block(), Block(-1, 0), Block(1, 0), Block(2, 0)], # Facing right
-            [Block(), Block(0, -1), Block(0, -2), Block(0, 1)], # Facing down
-            [Block(), Block(-1, 0), Block(-2, 0), Block(1, 0)] # Facing left
-        ])
-        self._setColor("#00d0ff")
-        self.updateCurrentBlockState()
-        self.shape = "I"
-
-class J(Tetromino):
-    def __init__(self):
-        super(J, self).__init__()
-        
-        #                                        #
-        # Offset is based on bottom middle block ###
-        #                                         ^
-        self._setStates([
-            [Block(), Block(0, 1), Block(0, -1), Block(-1, -1)], # Facing up
-            [Block(), Block(-1, 0), Block(-1, 1), Block(1, 0)], # Facing right
-            [Block(), Block(0, 1), Block(0, -1), Block(1, 1)], # Facing down
-            [Block(), Block(-1, 0), Block(1, 0), Block(1, -1)] # Facing left
-        ])
-        self._setColor("#4080ff")
-        self.updateCurrentBlockState()
-        self.shape = "J"
-        
-class L(Tetromino):
-    def __init__(self):
-        super(L, self).__init__()
-        
-        #                                          #
-        # Offset is based on bottom middle block ###
-        #                                         ^
-        self._setStates([
-            [Block(), Block(0, 1), Block(-1, 1), Block(0, -1)], # Facing up
-            [Block(), Block(-1, 0), Block(1, 1), Block(1, 0)], # Facing right
-            [Block(), Block(0, 1), Block(0, -1), Block(1, -1)], # Facing down
-            [Block(), Block(-1, 0), Block(1, 0), Block(-1, -1)] # Facing left
-        ])
-        self._setColor("#ff8020")
-        self.updateCurrentBlockState()
-        self.shape = "L"
-        
-class S(Tetromino):
-    def __init__(self):
-        super(S, self).__init__()
-        
-        #                                         ##
-        # Offset is based on bottom middle block ##
-        #                                         ^
-        self._setStates([
-            [Block(), Block(-1, 0), Block(-1, 1), Block(0, -1)], # Facing up
-            [Block(), Block(-1, 0), Block(0, 1), Block(1, 1)], # Facing right
-            [Block(), Block(0, 1), Block(1, 0), Block(1, -1)], # Facing down
-            [Block(), Block(0, -1), Block(1, 0), Block(-1, -1)] # Facing left
-        ])
-        self._setColor("#40d040")
-        self.updateCurrentBlockState()
-        self.shape = "S"
-        
-class Z(Tetromino):
-    def __init__(self):
-        super(Z, self).__init__()
-        
-        #                                        ##
-        # Offset is based on bottom middle block  ##
-        #                                         ^
-        self._setStates([
-            [Block(), Block(-1, 0), Block(-1, -1), Block(0, 1)], # Facing up
-            [Block(), Block(0, 1), Block(-1, 1), Block(1, 0)], # Facing right
-            [Block(), Block(0, -1), Block(1, 0), Block(1, 1)], # Facing down
-            [Block(), Block(0, -1), Block(-1, 0), Block(1, -1)] # Facing left
-        ])
-        self._setColor("#ff4020")
-        self.updateCurrentBlockState()
-        self.shape = "Z"
-
-class T(Tetromino):
-    def __init__(self):
-        super(T, self).__init__()
-        
-        #                                            #
-        # Offset is based on bottom middle block    ###
-        #                                            ^
-        self._setStates([
-            [Block(), Block(-1, 0), Block(0, -1), Block(0, 1)], # Facing up
-            [Block(), Block(1, 0), Block(-1, 0), Block(0, 1)],  # Facing right
-            [Block(), Block(0, 1), Block(0, -1), Block(1, 0)],  # Facing down
-            [Block(), Block(-1, 0), Block(1, 0), Block(0, -1)]  # Facing left
-        ])
-        self._setColor("#a040f0")
-        self.updateCurrentBlockState()
-        self.shape = "T"
-        
+        return self.kind.states[desiredState]
+
+# Does not rotate at all                  ##
+# Offset is based on bottom left block -> ##
+O: Final = TetrominoShape("O", Bag.O, [
+    [(0, 0), (-1, 0), (0, 1), (-1, 1)], # Facing up
+    [(0, 0), (-1, 0), (0, 1), (-1, 1)], # Facing right
+    [(0, 0), (-1, 0), (0, 1), (-1, 1)], # Facing down
+    [(0, 0), (-1, 0), (0, 1), (-1, 1)]  # Facing left
+])
+
+# Offset is based on middle right block ####
+#                                         ^
+I: Final = TetrominoShape("I", Bag.I, [
+    [(0, 0), (0, -1), (0, 1), (0, 2)],  # Facing up
+    [(0, 0), (-1, 0), (1, 0), (2, 0)],  # Facing right
+    [(0, 0), (0, -1), (0, -2), (0, 1)], # Facing down
+    [(0, 0), (-1, 0), (-2, 0), (1, 0)]  # Facing left
+])
+
+#                                        #
+# Offset is based on bottom middle block ###
+#                                         ^
+J: Final = TetrominoShape("J", Bag.J, [
+    [(0, 0), (0, 1), (0, -1), (-1, -1)], # Facing up
+    [(0, 0), (-1, 0), (-1, 1), (1, 0)],  # Facing right
+    [(0, 0), (0, 1), (0, -1), (1, 1)],   # Facing down
+    [(0, 0), (-1, 0), (1, 0), (1, -1)]   # Facing left
+])
+
+#                                          #
+# Offset is based on bottom middle block ###
+#                                         ^
+L: Final = TetrominoShape("L", Bag.L, [
+    [(0, 0), (0, 1), (-1, 1), (0, -1)], # Facing up
+    [(0, 0), (-1, 0), (1, 1), (1, 0)],  # Facing right
+    [(0, 0), (0, 1), (0, -1), (1, -1)], # Facing down
+    [(0, 0), (-1, 0), (1, 0), (-1, -1)] # Facing left
+])
+
+#                                         ##
+# Offset is based on bottom middle block ##
+#                                         ^
+S: Final = TetrominoShape("S", Bag.S, [
+    [(0, 0), (-1, 0), (-1, 1), (0, -1)], # Facing up
+    [(0, 0), (-1, 0), (0, 1), (1, 1)],   # Facing right
+    [(0, 0), (0, 1), (1, 0), (1, -1)],   # Facing down
+    [(0, 0), (0, -1), (1, 0), (-1, -1)]  # Facing left
+])
+
+#                                        ##
+# Offset is based on bottom middle block  ##
+#                                         ^
+Z: Final = TetrominoShape("Z", Bag.Z, [
+    [(0, 0), (-1, 0), (-1, -1), (0, 1)], # Facing up
+    [(0, 0), (0, 1), (-1, 1), (1, 0)],   # Facing right
+    [(0, 0), (0, -1), (1, 0), (1, 1)],   # Facing down
+    [(0, 0), (0, -1), (-1, 0), (1, -1)]  # Facing left
+])
+
+#                                            #
+# Offset is based on bottom middle block    ###
+#                                            ^
+T: Final = TetrominoShape("T", Bag.T, [
+    [(0, 0), (-1, 0), (0, -1), (0, 1)], # Facing up
+    [(0, 0), (1, 0), (-1, 0), (0, 1)],  # Facing right
+    [(0, 0), (0, 1), (0, -1), (1, 0)],  # Facing down
+    [(0, 0), (-1, 0), (1, 0), (0, -1)]  # Facing left
+])
+
+# Tetromino types in Bag order, so a shapeId indexes them
+TETROMINO_TYPES: Final = [O, I, J, L, S, Z, T]
@@ -1,27 +1,108 @@
-from threading import Timer
+import time
 
-class RepeatedTimer(object):
+class GameLoop(object):
+    # Calls a function every interval seconds, with the schedule kept against a monotonic clock
+    # so that a late tick doesn't push back every tick after it
+    # Subclasses decide where the ticks run: the Tk main loop, or a plain headless loop
     def __init__(self, interval, function, *args, **kwargs):
-        self._timer     = None
         self.interval   = interval
         self.function   = function
         self.args       = args
         self.kwargs     = kwargs
         self.is_running = False
-        self.start()
+        self._nextTime  = 0.0
 
-    def _run(self):
-        self.is_running = False
-        self.start()
-        self.function(*self.args, **self.kwargs)
+        # Timing stats, in seconds. Drift is how late a tick ran compared to its schedule
+        self.ticks        = 0
+        self.missedFrames = 0
+        self.drift        = 0.0
+        self.maxDrift     = 0.0
+
+    # Change the interval (i.e. gravity) from the next tick on
+    def setInterval(self, interval):
+        if (self.is_running):
+            self._nextTime += interval - self.interval
+        self.interval = interval
 
     def start(self):
         if not self.is_running:
-            self._timer = Timer(self.interval, self._run)
-            self._timer.start()
+            self._nextTime = time.monotonic() + self.interval
             self.is_running = True
 
     def stop(self):
-        self._timer.cancel()
         self.is_running = False
- 
\ No newline at end of file
+
+    def getStats(self):
+        return {
+            "ticks": self.ticks,
+            "missedFrames": self.missedFrames,
+            "drift": self.drift,
+            "maxDrift": self.maxDrift
+        }
+
+    # Seconds until the next tick is due
+    def _timeUntilTick(self):
+        return max(0.0, self._nextTime - time.monotonic())
+
+    # Run the tick if it is due. Returns True if it ran
+    def _runDue(self):
+        now = time.monotonic()
+        lateness = now - self._nextTime
+        if (lateness < 0):
+            return False
+
+        self.drift = lateness
+        self.maxDrift = max(self.maxDrift, lateness)
+
+        # Whole intervals that passed without a tick are skipped rather than run in a burst
+        missed = int(lateness // self.interval)
+        if (missed > 0):
+            self.missedFrames += missed
+            self._nextTime += missed * self.interval
+        self._nextTime += self.interval
+
+        self.ticks += 1
+        self.function(*self.args, **self.kwargs)
+        return True
+
+class TkGameLoop(GameLoop):
+    # Ticks on the Tk main loop via after(), so the function can touch widgets
+    def __init__(self, widget, interval, function, *args, **kwargs):
+        super(TkGameLoop, self).__init__(interval, function, *args, **kwargs)
+        self.widget = widget
+        self._afterId = None
+        self.start()
+
+    def start(self):
+        if not self.is_running:
+            super(TkGameLoop, self).start()
+            self._schedule()
+
+    def stop(self):
+        if (self._afterId is not None):
+            self.widget.after_cancel(self._afterId)
+            self._afterId = None
+        super(TkGameLoop, self).stop()
+
+    def _schedule(self):
+        self._afterId = self.widget.after(int(self._timeUntilTick() * 1000), self._run)
+
+    def _run(self):
+        self._afterId = None
+        if not self.is_running:
+            return
+        self._runDue()
+        if self.is_running:
+            self._schedule()
+
+class HeadlessGameLoop(GameLoop):
+    # Ticks on the calling thread, sleeping between ticks. run() returns after the given number of ticks
+    # or once stop() is called from the tick function
+    def run(self, ticks = None):
+        self.start()
+        ran = 0
+        while (self.is_running and (ticks is None or ran < ticks)):
+            time.sleep(self._timeUntilTick())
+            if (self._runDue()):
+                ran += 1
+        self.stop()
@@ -0,0 +1,90 @@
+from typing import Final
+from collections import OrderedDict
+import random
+
+# Fixed, so hashes match across processes and runs
+ZOBRIST_SEED: Final = 0x7e7215
+
+# Columns covered by each lookup table of a row's hash
+ROW_CHUNK_BITS: Final = 5
+
+_rng = random.Random(ZOBRIST_SEED)
+
+def randomKeys(count):
+    return [_rng.getrandbits(64) for i in range(0, count)]
+
+# Hash of every possible row, split into chunks of columns so each row is a couple of lookups
+# Indexed [row][chunk][bits of that chunk]
+def buildRowKeys(cellKeys, width, height):
+    rowKeys = []
+    for row in range(0, height):
+        chunks = []
+        for firstCol in range(0, width, ROW_CHUNK_BITS):
+            colCount = min(ROW_CHUNK_BITS, width - firstCol)
+            table = [0] * (1 << colCount)
+            for bits in range(1, 1 << colCount):
+                for col in range(0, colCount):
+                    if ((bits >> col) & 1):
+                        table[bits] ^= cellKeys[row * width + firstCol + col]
+            chunks.append(tuple(table))
+        rowKeys.append(tuple(chunks))
+    return tuple(rowKeys)
+
+def rowHash(rowKeys, row, bits):
+    rowHash = 0
+    for table in rowKeys[row]:
+        rowHash ^= table[bits & ((1 << ROW_CHUNK_BITS) - 1)]
+        bits >>= ROW_CHUNK_BITS
+    return rowHash
+
+# Upcoming shapes, so a search result can be cached for a board and the preview it was searched with
+QUEUE_DEPTH: Final = 16
+QUEUE_KEYS: Final = tuple(tuple(randomKeys(7)) for depth in range(0, QUEUE_DEPTH))
+
+def queueHash(shapes):
+    queueHash = 0
+    for depth, shapeId in enumerate(shapes):
+        queueHash ^= QUEUE_KEYS[depth][shapeId]
+    return queueHash
+
+class TranspositionTable(object):
+    # Caches search results by hash, evicting the least recently used entry once it's full
+    def __init__(self, maxEntries = 1 << 16):
+        self.maxEntries = maxEntries
+        self.__entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    # The cached value, or None
+    def get(self, key):
+        value = self.__entries.get(key)
+        if (value is None):
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.__entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.__entries[key] = value
+        self.__entries.move_to_end(key)
+        if (len(self.__entries) > self.maxEntries):
+            self.__entries.popitem(last = False)
+            self.evictions += 1
+
+    def clear(self):
+        self.__entries.clear()
+
+    def getStats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.__entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": self.hits / lookups if lookups > 0 else 0.0
+        }